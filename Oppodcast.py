@@ -5,35 +5,37 @@ import uuid
 import time
 from datetime import datetime
 
+from job_store import get_job_store, estimate_start_times, PRIORITIES, DEFAULT_PRIORITY
+from progress_channel import read_progress
+from pipeline import SHORTS_BATCH_JOB_TYPE, pipeline_summary, stage_outputs
+from media_index import get_media_index
+from worker import queue_lanes
+
 # --- FONCTION CRITIQUE : FILE D'ATTENTE ---
 def add_job_to_queue(job_data):
-    """Ajoute une tâche au fichier centralisé jobs.json"""
-    jobs_file = "jobs.json"
-    if os.path.exists(jobs_file):
-        try:
-            with open(jobs_file, "r") as f: jobs = json.load(f)
-        except: jobs = {}
-    else:
-        jobs = {}
-    
-    jobs[job_data["id"]] = job_data
-    
-    # Sauvegarde atomique
-    temp_file = f"{jobs_file}.tmp"
-    with open(temp_file, "w") as f:
-        json.dump(jobs, f, indent=4)
-    os.replace(temp_file, jobs_file)
+    """Ajoute une tâche à la file d'attente (une seule ligne insérée en base)"""
+    get_job_store().add_job(job_data)
 
 # --- NOTIFICATIONS WORKER ---
 def check_job_notifications():
-    if not os.path.exists("jobs.json"): return
     try:
-        with open("jobs.json", "r") as f: jobs = json.load(f)
         if "notified_jobs" not in st.session_state: st.session_state["notified_jobs"] = set()
-        for jid, data in jobs.items():
-            state_key = f"{jid}_{data['status']}"
+        if "notify_since" not in st.session_state: st.session_state["notify_since"] = time.time()
+        # Requête indexée : seulement les jobs terminés depuis l'ouverture de la session
+        jobs = get_job_store().list_jobs(status=["completed", "failed"], since=st.session_state["notify_since"])
+        for data in jobs:
+            state_key = f"{data['id']}_{data['status']}"
             if state_key not in st.session_state["notified_jobs"]:
                 if data["status"] == "completed":
+                    # Pipeline expansé en étapes : terminé seulement quand sa dernière étape l'est
+                    if data.get("stage_ids"):
+                        summary = pipeline_summary(get_job_store(), data["id"])
+                        if summary.get("pending") or summary.get("processing"):
+                            continue
+                        if summary.get("failed"):
+                            # Les étapes en échec ont déjà leur propre alerte
+                            st.session_state["notified_jobs"].add(state_key)
+                            continue
                     st.toast(f"✅ Tâche terminée : {data.get('type', 'Job')}", icon="🎉")
                     st.session_state["notified_jobs"].add(state_key)
                 elif data["status"] == "failed":
@@ -196,8 +198,10 @@ except ImportError: InstaGenerator = None
 # Telegram supprimé ici
 try: from youtube_generator import YouTubeGenerator
 except ImportError: YouTubeGenerator = None
-try: from youtube_uploader import YouTubeUploader
-except ImportError: YouTubeUploader = None
+# Import léger : le client Google n'est chargé qu'au moment d'un upload
+try: from youtube_uploader import YouTubeUploader, GOOGLE_CLIENT_AVAILABLE
+except ImportError: YouTubeUploader, GOOGLE_CLIENT_AVAILABLE = None, False
+if not GOOGLE_CLIENT_AVAILABLE: YouTubeUploader = None
 try: from shorts_generator import ShortsGenerator 
 except ImportError: ShortsGenerator = None
 try: from translations import TRANS
@@ -234,15 +238,29 @@ def save_secrets(data_dict):
     with open(SECRETS_PATH, "w") as f: json.dump(current, f)
     st.toast("Identifiants sauvegardés !", icon="💾")
 
+def parse_seconds(text):
+    """'90', '90.5', '1:30' ou '1:02:03' -> secondes (ValueError si invalide ou négatif)"""
+    parts = text.strip().split(":")
+    if len(parts) > 3:
+        raise ValueError(text)
+    seconds = 0.0
+    for part in parts:
+        value = float(part)
+        if not 0 <= value < float("inf"):
+            raise ValueError(text)
+        seconds = seconds * 60 + value
+    return seconds
+
+# Index des médias de l'inbox : une requête par rerun au lieu d'un listdir + un JSON par épisode
+# (un stat par fichier, seuls les fichiers nouveaux ou modifiés sont re-sondés)
+media_index = get_media_index(INBOX_DIR)
+media_index.refresh()
+inbox_media = {m["filename"]: m for m in media_index.list_media()}
+
 def get_episode_label(filename):
-    json_name = filename.replace(".mp3", ".json")
-    json_path = os.path.join(INBOX_DIR, json_name)
-    if os.path.exists(json_path):
-        try:
-            with open(json_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return f"🎙️ {data.get('title', t('untitled'))}"
-        except: pass
+    entry = inbox_media.get(filename)
+    if entry and entry["title"]:
+        return f"🎙️ {entry['title']}"
     return f"📁 {filename}"
 
 # --- SESSION STATE ---
@@ -337,8 +355,46 @@ with st.expander(t("s1_title"), expanded=True):
                     title = st.text_input(t("ep_title"), placeholder=t("ep_title_ph"))
                     description = st.text_area(t("ep_desc"), placeholder=t("ep_desc_ph"))
                     
-                    if st.button(t("btn_queue"), type="primary"):
-                        if title:
+                    c_prio, c_deadline = st.columns(2)
+                    priority = c_prio.selectbox(
+                        t("priority"), options=list(PRIORITIES.values()),
+                        index=list(PRIORITIES.values()).index(DEFAULT_PRIORITY),
+                        format_func=lambda p: t(f"prio_{[k for k, v in PRIORITIES.items() if v == p][0]}")
+                    )
+                    deadline = None
+                    if c_deadline.checkbox(t("set_deadline")):
+                        d_date = c_deadline.date_input(t("deadline"), value=datetime.now().date())
+                        d_time = c_deadline.time_input(t("deadline"), value=datetime.now().time().replace(second=0, microsecond=0), label_visibility="collapsed")
+                        deadline = datetime.combine(d_date, d_time).timestamp()
+                    
+                    # Pipeline complet : Vodio + visuel + vidéos + shorts + uploads YouTube en un clic
+                    publish_all = st.checkbox(t("publish_all"))
+                    if publish_all:
+                        c_pub1, c_pub2 = st.columns(2)
+                        pub_formats = c_pub1.multiselect(
+                            t("vid_format"), ["square", "landscape"], default=["square"],
+                            format_func=lambda f: t("fmt_square") if f == "square" else t("fmt_landscape")
+                        )
+                        pub_render_mode = c_pub2.selectbox(
+                            t("render_mode"), options=["turbo", "balanced", "quality", "static"], index=1,
+                            format_func=lambda x: {"turbo": t("turbo_desc"), "balanced": t("balanced_desc"), "quality": t("quality_desc"), "static": t("static_desc")}[x],
+                            key="pub_render_mode"
+                        )
+                        pub_shorts = st.text_input(t("pub_shorts"), value="0")
+                        pub_privacy = st.selectbox(t("visibility"), ["private", "unlisted", "public"], key="pub_privacy")
+
+                    if st.button(t("btn_publish") if publish_all else t("btn_queue"), type="primary"):
+                        # Saisie validée avant toute écriture : rien n'est mis en file si un début est invalide
+                        short_starts, bad_starts = [], []
+                        for x in (pub_shorts.replace(";", ",").split(",") if publish_all else []):
+                            if x.strip():
+                                try:
+                                    short_starts.append(parse_seconds(x))
+                                except ValueError:
+                                    bad_starts.append(x.strip())
+                        if bad_starts:
+                            st.error(f"{t('err_shorts_times')} : {', '.join(bad_starts)}")
+                        elif title:
                             job_id = str(uuid.uuid4())
                             mp3_filename = f"{job_id}.mp3"
                             mp3_path = os.path.join(INBOX_DIR, mp3_filename)
@@ -355,13 +411,25 @@ with st.expander(t("s1_title"), expanded=True):
                                 "audio_path": mp3_path,
                                 "status": "pending",
                                 "created_at": time.time(),
-                                "progress": 0
+                                "progress": 0,
+                                "priority": priority,
+                                "deadline": deadline
                             }
+                            if publish_all:
+                                job_data.update({
+                                    "type": "publish_episode",
+                                    "video_formats": pub_formats,
+                                    "render_mode": pub_render_mode,
+                                    "shorts": [{"start_time": start, "duration": 58} for start in short_starts],
+                                    "privacy": pub_privacy,
+                                    "upload_youtube": os.path.exists("token.pickle")
+                                })
                             
                             add_job_to_queue(job_data)
                             
                             with open(os.path.join(INBOX_DIR, f"{job_id}.json"), "w", encoding="utf-8") as f:
                                 json.dump(job_data, f, ensure_ascii=False, indent=4)
+                            media_index.upsert(mp3_path)
 
                             st.success(f"✅ {title} ajouté à la file d'attente !")
                             time.sleep(1)
@@ -435,8 +503,7 @@ with st.expander(t("s3_title"), expanded=False):
             
             with col_y1:
                 st.subheader(t("create_vid"))
-                mp3_files = [f for f in os.listdir(INBOX_DIR) if f.endswith(".mp3")]
-                mp3_files.sort(key=lambda x: os.path.getctime(os.path.join(INBOX_DIR, x)), reverse=True)
+                mp3_files = list(inbox_media)  # déjà triés du plus récent au plus ancien
                 
                 selected_mp3 = st.selectbox(t("choose_ep"), options=mp3_files, format_func=get_episode_label)
                 video_format = st.radio(t("vid_format"), [t("fmt_square"), t("fmt_landscape")], horizontal=True)
@@ -445,11 +512,12 @@ with st.expander(t("s3_title"), expanded=False):
                 st.markdown(f"##### {t('perf_settings')}")
                 render_mode = st.selectbox(
                     t("render_mode"),
-                    options=["turbo", "balanced", "quality"],
+                    options=["turbo", "balanced", "quality", "static"],
                     format_func=lambda x: {
                         "turbo": t("turbo_desc"),
                         "balanced": t("balanced_desc"),
-                        "quality": t("quality_desc")
+                        "quality": t("quality_desc"),
+                        "static": t("static_desc")
                     }[x]
                 )
                 
@@ -460,7 +528,29 @@ with st.expander(t("s3_title"), expanded=False):
                 current_img = st.session_state.get("generated_img_path")
                 if not current_img:
                     st.warning(t("warn_img"))
-                
+
+                # Aperçu : même graphe que le rendu final, une image ou quelques secondes en basse résolution
+                c_prev1, c_prev2 = st.columns(2)
+                preview_still = c_prev1.button(t("btn_preview_still"), disabled=(not selected_mp3 or not current_img), width='stretch')
+                preview_clip = c_prev2.button(t("btn_preview_clip"), disabled=(not selected_mp3 or not current_img), width='stretch')
+                if preview_still or preview_clip:
+                    try:
+                        with st.spinner(t("rendering_preview")):
+                            st.session_state["video_preview_path"] = YouTubeGenerator(output_dir=GENERATED_DIR).generate_preview(
+                                os.path.join(INBOX_DIR, selected_mp3), current_img,
+                                format="square" if t("fmt_square") in video_format else "landscape",
+                                render_mode=render_mode, bg_color=bg_color_hex,
+                                seconds=5 if preview_clip else 0
+                            )
+                    except Exception as e:
+                        st.error(f"Erreur : {e}")
+                preview_path = st.session_state.get("video_preview_path")
+                if preview_path and os.path.exists(preview_path):
+                    if preview_path.endswith(".mp4"):
+                        st.video(preview_path)
+                    else:
+                        st.image(preview_path)
+
                 if st.button(t("btn_render_vid"), type="primary", disabled=(not selected_mp3 or not current_img), width='stretch'):
                     display_name = get_episode_label(selected_mp3).replace("🎙️ ", "")
                     safe_name = "".join([c for c in display_name if c.isalnum() or c in (' ', '-', '_')]).strip().replace(" ", "_")
@@ -533,8 +623,27 @@ with st.expander(t("s4_title"), expanded=False):
                 else:
                     st.info(f"{t('info_source')} {get_episode_label(selected_mp3)}")
                     c_t1, c_t2 = st.columns(2)
-                    start_time = c_t1.number_input(t("start_sec"), min_value=0, value=0)
                     duration = c_t2.number_input(t("dur_sec"), min_value=15, max_value=60, value=58) 
+
+                    # Moments forts : fenêtres de la durée choisie, proposées comme débuts possibles
+                    highlights_key = f"highlights_{selected_mp3}_{duration}"
+                    if st.button(t("btn_highlights")):
+                        from highlights import find_highlights
+                        with st.spinner(t("analysing_highlights")):
+                            st.session_state[highlights_key] = find_highlights(
+                                os.path.join(INBOX_DIR, selected_mp3), duration=duration,
+                                cache_dir=os.path.join(GENERATED_DIR, ".cache", "pcm")
+                            )
+                    default_start = 0
+                    picks = st.session_state.get(highlights_key)
+                    if picks:
+                        pick = st.radio(
+                            t("highlight_picks"), picks, horizontal=True,
+                            format_func=lambda h: f"{int(h['start_time']) // 60}:{int(h['start_time']) % 60:02d} ({h['score']:+.1f})"
+                        )
+                        default_start = int(pick["start_time"])
+                    # La clé change avec la suggestion choisie : le champ reprend sa valeur
+                    start_time = c_t1.number_input(t("start_sec"), min_value=0, value=default_start, key=f"short_start_{default_start}")
                     
                     st.divider()
                     st.markdown(f"##### {t('perf_settings')}")
@@ -582,6 +691,61 @@ with st.expander(t("s4_title"), expanded=False):
                             progress_short_container.empty()
                             st.error(f"Erreur : {e}")
 
+                    # Série de shorts rendue par le worker (fond et audio préparés une seule fois)
+                    st.divider()
+                    default_windows = "\n".join(
+                        f"{int(p['start_time'])}, {duration}, " for p in (picks or [{"start_time": start_time}])
+                    )
+                    windows_text = st.text_area(t("batch_windows"), value=default_windows, key=f"batch_windows_{highlights_key}")
+                    if st.button(t("btn_batch_shorts")):
+                        # Ligne par ligne : une ligne invalide est signalée, les autres partent quand même
+                        windows, bad_lines = [], []
+                        for number, line in enumerate(windows_text.splitlines(), 1):
+                            parts = [p.strip() for p in line.split(",", 2)]
+                            if not parts[0]:
+                                continue
+                            try:
+                                window = {
+                                    "start_time": parse_seconds(parts[0]),
+                                    "duration": parse_seconds(parts[1]) if len(parts) > 1 and parts[1] else float(duration),
+                                    "title": parts[2] if len(parts) > 2 else ""
+                                }
+                            except ValueError:
+                                window = None
+                            if not window or window["duration"] <= 0:
+                                bad_lines.append(f"{number} ({line.strip()})")
+                                continue
+                            windows.append(window)
+                        if bad_lines:
+                            st.warning(f"{t('err_batch_lines')} : {', '.join(bad_lines)}")
+                        if not windows:
+                            st.error(t("err_batch_empty"))
+                        else:
+                            batch_id = str(uuid.uuid4())
+                            add_job_to_queue({
+                                "id": batch_id,
+                                "type": SHORTS_BATCH_JOB_TYPE,
+                                "title": get_episode_label(selected_mp3).replace("🎙️ ", ""),
+                                "audio_path": os.path.join(INBOX_DIR, selected_mp3),
+                                "image_path": st.session_state["generated_img_path"],
+                                "windows": windows,
+                                "render_mode": short_render_mode,
+                                "bg_color": short_bg_color,
+                                "status": "pending",
+                                "created_at": time.time(),
+                                "progress": 0
+                            })
+                            st.session_state["shorts_batch_id"] = batch_id
+                            st.success(f"✅ {len(windows)} {t('batch_queued')}")
+
+                    batch_id = st.session_state.get("shorts_batch_id")
+                    if batch_id:
+                        summary = pipeline_summary(get_job_store(), batch_id)
+                        if summary:
+                            st.caption(f"{t('batch_status')} : " + " · ".join(f"{k} {v}" for k, v in sorted(summary.items())))
+                        for path in stage_outputs(get_job_store(), batch_id):
+                            st.caption(f"🎞️ {os.path.basename(path)}")
+
             with col_s2:
                 st.subheader(t("preview"))
                 short_current = st.session_state.get("generated_short_path")
@@ -608,6 +772,37 @@ with st.expander(t("s4_title"), expanded=False):
 
 # --- 5. HISTORIQUE ---
 with st.expander(t("hist_title"), expanded=False):
+    # Progression live lue dans les slots mmap du worker (pas dans la base)
+    active_jobs = get_job_store().list_jobs(status="processing")
+    if active_jobs:
+        st.markdown(f"##### {t('jobs_running')}")
+        for job in active_jobs:
+            live = read_progress(job["id"])
+            percent = int(live["percent"]) if live else job.get("progress", 0)
+            label = f"{job.get('title') or job['type']} · {percent}%"
+            if live and live["fps"]:
+                label += f" · {live['fps']:.0f} fps · x{live['speed']:.2f}"
+            if live and live["eta"] is not None:
+                label += f" · ETA {int(live['eta'])}s"
+            st.progress(min(percent, 100), text=label)
+
+    # File d'attente dans l'ordre du scheduler (priorité, échéance, vieillissement),
+    # estimée sur les voies du worker (même OPPODCAST_WORKER_MODE que lui)
+    pool = os.environ.get("OPPODCAST_WORKER_MODE") == "pool"
+    queue_estimates = estimate_start_times(get_job_store(), queue_lanes(pool))
+    if queue_estimates:
+        st.markdown(f"##### {t('queue_title')}")
+        prio_names = {v: t(f"prio_{k}") for k, v in PRIORITIES.items()}
+        # Jobs prêts d'abord ; les étapes qui attendent leur amont ou un nouvel essai sont signalées
+        states = {None: t("queue_ready"), "deps": t("queue_blocked_deps"), "retry": t("queue_blocked_retry")}
+        st.dataframe([{
+            t("queue_pos"): i + 1,
+            t("title"): job.get("title") or job["type"],
+            t("queue_state"): states.get(job.get("blocked"), job.get("blocked")),
+            t("priority"): prio_names.get(job.get("priority"), job.get("priority")),
+            t("deadline"): datetime.fromtimestamp(job["deadline"]).strftime("%d/%m %H:%M") if job.get("deadline") else "-",
+            t("expected_start"): datetime.fromtimestamp(start).strftime("%d/%m %H:%M"),
+        } for i, (job, start) in enumerate(queue_estimates)], width='stretch', hide_index=True)
     history_files = [f for f in os.listdir(INBOX_DIR) if f.endswith(".json")]
     history_files.sort(key=lambda x: os.path.getctime(os.path.join(INBOX_DIR, x)), reverse=True)
     if history_files:
@@ -0,0 +1,132 @@
+import os
+import subprocess
+import threading
+
+import numpy as np
+
+from ffmpeg_runner import run_ffmpeg
+from render_assets import file_digest
+from render_governor import governed_command
+from render_cache import RenderCache
+
+# --- ANALYSE AUDIO ---
+# Chaque épisode est décodé une seule fois en PCM mono (fichier brut en cache, lu par memmap),
+# puis réduit en enveloppes crête/RMS stockées en .npy à côté du fichier de l'inbox.
+# Les rendus suivants (re-rendus, aperçus, changement de style) ne redécodent plus l'audio.
+# Les caches vivent sous <output_dir>/.cache du générateur appelant (défaut : generated/.cache).
+ANALYSIS_SAMPLE_RATE = 16000
+ENVELOPE_RATE = 200  # points d'enveloppe par seconde (8 par image à 25 fps)
+ENVELOPE_VERSION = 1
+CACHE_ROOT = os.path.join("generated", ".cache")
+PCM_CACHE_DIR = os.path.join(CACHE_ROOT, "pcm")
+PCM_CACHE_MAX_BYTES = int(float(os.environ.get("OPPODCAST_PCM_CACHE_GB", "5")) * 1024 ** 3)
+
+# --- AUDIO ENCODÉ PARTAGÉ ---
+# L'AAC des livrables est encodé une seule fois par épisode et par débit : vidéos et shorts
+# le recopient tel quel (-c:a copy) au lieu de ré-encoder le MP3 à chaque rendu.
+AAC_BITRATE = "192k"
+AAC_CACHE_DIR = os.path.join(CACHE_ROOT, "aac")
+AAC_CACHE_MAX_BYTES = int(float(os.environ.get("OPPODCAST_AAC_CACHE_GB", "2")) * 1024 ** 3)
+
+
+def ensure_pcm(audio_path, sample_rate=ANALYSIS_SAMPLE_RATE, channels=1, cache_dir=PCM_CACHE_DIR):
+    """
+    Chemin du PCM int16 (s16le) de l'épisode, décodé au premier appel puis servi depuis le cache.
+    Lisible directement par ffmpeg (-f s16le) : un -ss y est un simple décalage d'octets.
+    """
+    path = os.path.join(cache_dir, f"{file_digest(audio_path)}_{sample_rate}x{channels}.s16")
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            subprocess.run(
+                governed_command(["ffmpeg", "-v", "error", "-i", audio_path, "-ac", str(channels), "-ar", str(sample_rate), "-f", "s16le", "-"]),
+                stdout=f, check=True
+            )
+        os.replace(temp_path, path)
+        # Environ 115 Mo par heure d'audio (mono 16 kHz) : le cache est borné (LRU, comme les rendus)
+        RenderCache(cache_dir, PCM_CACHE_MAX_BYTES).evict()
+    else:
+        os.utime(path)
+    return path
+
+
+def ensure_aac(audio_path, bitrate=AAC_BITRATE, cache_dir=AAC_CACHE_DIR):
+    """
+    Chemin de l'AAC (.m4a) de l'épisode, encodé au premier appel puis servi depuis le cache.
+    Clé : empreinte du contenu source + débit. Le conteneur MP4 indexe chaque paquet :
+    un -ss en entrée y est une recherche directe, sans décoder ce qui précède.
+    """
+    path = os.path.join(cache_dir, f"{file_digest(audio_path)}_aac{bitrate}.m4a")
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        # Suffixe .tmp : ignoré par l'éviction pendant l'encodage ; un nom par thread
+        # (le worker peut rendre deux livrables du même épisode en parallèle)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        run_ffmpeg(
+            ["ffmpeg", "-y", "-v", "error", "-i", audio_path, "-vn", "-c:a", "aac", "-b:a", bitrate, "-f", "mp4", temp_path],
+            label=f"audio:aac{bitrate}"
+        )
+        os.replace(temp_path, path)
+        # Environ 86 Mo par heure à 192k : borné en LRU, comme le PCM
+        RenderCache(cache_dir, AAC_CACHE_MAX_BYTES).evict()
+    else:
+        os.utime(path)
+    return path
+
+
+def decode_pcm(audio_path, sample_rate=ANALYSIS_SAMPLE_RATE, cache_dir=PCM_CACHE_DIR):
+    """PCM mono int16 de l'épisode, mappé en mémoire depuis le cache"""
+    path = ensure_pcm(audio_path, sample_rate, 1, cache_dir)
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.int16)
+    return np.memmap(path, dtype=np.int16, mode="r")
+
+
+def compute_envelope(pcm, sample_rate=ANALYSIS_SAMPLE_RATE, rate=ENVELOPE_RATE, block_seconds=60):
+    """
+    Enveloppes (crête, RMS) normalisées [0, 1] à `rate` points par seconde : tableau float16 (n, 2).
+    Calcul vectorisé par blocs d'une minute pour borner la mémoire sur les épisodes longs.
+    """
+    hop = sample_rate // rate
+    n = len(pcm) // hop
+    envelope = np.empty((n, 2), dtype=np.float16)
+    step = hop * rate * block_seconds
+    for start in range(0, n * hop, step):
+        block = np.asarray(pcm[start:min(start + step, n * hop)], dtype=np.float32).reshape(-1, hop) / 32768.0
+        i = start // hop
+        envelope[i:i + len(block), 0] = np.abs(block).max(axis=1)
+        envelope[i:i + len(block), 1] = np.sqrt((block * block).mean(axis=1))
+    return envelope
+
+
+def envelope_path(audio_path):
+    return f"{os.path.splitext(audio_path)[0]}.env{ENVELOPE_VERSION}-{ENVELOPE_RATE}.npy"
+
+
+def load_envelope(audio_path, cache_root=CACHE_ROOT):
+    """
+    Enveloppe de l'épisode depuis le .npy (recalculée si absent ou plus ancien que l'audio).
+    cache_root : dossier .cache du générateur (repli de l'enveloppe, PCM décodé).
+    """
+    candidates = [
+        envelope_path(audio_path),
+        os.path.join(cache_root, "envelopes", f"{file_digest(audio_path)}.env{ENVELOPE_VERSION}-{ENVELOPE_RATE}.npy"),
+    ]
+    audio_mtime = os.path.getmtime(audio_path)
+    for path in candidates:
+        if os.path.exists(path) and os.path.getmtime(path) >= audio_mtime:
+            return np.load(path)
+
+    envelope = compute_envelope(decode_pcm(audio_path, cache_dir=os.path.join(cache_root, "pcm")))
+    for path in candidates:
+        # Inbox en lecture seule : repli sur le cache de generated/
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp.npy"
+            np.save(temp_path, envelope)
+            os.replace(temp_path, path)
+            break
+        except OSError:
+            continue
+    return envelope
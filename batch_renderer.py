@@ -0,0 +1,150 @@
+import os
+
+from ffmpeg_runner import run_ffmpeg
+from render_assets import still_loop
+from render_cache import RenderCache
+from shorts_generator import ShortsGenerator
+from youtube_generator import YouTubeGenerator, FPS
+
+# --- RENDU GROUPÉ ---
+# Tous les livrables d'un épisode (vidéo carrée, paysage, shorts) en un seul ffmpeg :
+# le MP3 et les images sont décodés une fois, puis répartis par split/asplit vers
+# une branche par sortie (mise en page, waveform et encodage propres au livrable).
+# Les shorts sont des branches découpées (trim/atrim) du même flux décodé.
+# La piste audio de chaque sortie est recopiée depuis l'AAC de l'épisode en cache.
+
+
+class BatchRenderer:
+    def __init__(self, output_dir="generated"):
+        self.output_dir = output_dir
+        # Statistiques ffmpeg du dernier passage groupé ; None si tout venait du cache
+        self.last_render = None
+        self.videos = YouTubeGenerator(output_dir)
+        self.shorts = ShortsGenerator(output_dir)
+
+    def _cache_key(self, cache, out, audio_path, image_path, render_mode, bg_color):
+        # Mêmes clés que generate_video / generate_short : le cache est partagé
+        if out["kind"] == "short":
+            return self.shorts.cache_key(cache, audio_path, image_path, out.get("start_time", 0), out.get("duration", 58), render_mode, bg_color)
+        return self.videos.cache_key(cache, audio_path, image_path, out.get("format", "square"), render_mode, bg_color)
+
+    def render_batch(self, audio_path, image_path, outputs, render_mode="balanced", bg_color="#000000",
+                     progress_callback=None, stats_callback=None, use_cache=True):
+        """
+        outputs : liste de livrables
+          {"kind": "video", "format": "square"|"landscape", "output_filename": "..."}
+          {"kind": "short", "start_time": 120, "duration": 58, "output_filename": "..."}
+        Renvoie les chemins produits, dans l'ordre de outputs.
+        Les livrables déjà en cache ne sont pas ré-encodés ; les autres partagent un seul passage ffmpeg.
+        """
+        cache = RenderCache(os.path.join(self.output_dir, ".cache", "renders")) if use_cache else None
+        self.last_render = None
+
+        paths, pending = [], []
+        for out in outputs:
+            path = os.path.join(self.output_dir, out["output_filename"])
+            paths.append(path)
+            key = self._cache_key(cache, out, audio_path, image_path, render_mode, bg_color) if cache else None
+            if cache and cache.lookup(key, path):
+                print(f"♻️ Rendu servi par le cache : {out['output_filename']}")
+                continue
+            # Les entrées du cache sont des hardlinks : on ne réécrit jamais un inode existant
+            if os.path.exists(path):
+                os.remove(path)
+            pending.append((out, path, key))
+
+        if pending:
+            self._render(audio_path, image_path, pending, render_mode, bg_color, progress_callback, stats_callback)
+            if cache:
+                for _, path, key in pending:
+                    cache.put(key, path)
+                cache.evict()
+
+        if progress_callback: progress_callback(100)
+        return paths
+
+    def _render(self, audio_path, image_path, pending, render_mode, bg_color, progress_callback, stats_callback):
+        from audio_analysis import ensure_aac
+        total_duration = self.videos.get_audio_duration(audio_path)
+        audio_track = ensure_aac(audio_path, cache_dir=os.path.join(self.output_dir, ".cache", "aac"))
+
+        # Une branche par livrable : graphe de mise en page du générateur concerné
+        branches = []
+        for index, (out, path, _) in enumerate(pending):
+            tag = str(index)
+            if out["kind"] == "short":
+                start = float(out.get("start_time", 0))
+                duration = float(out.get("duration", 58))
+                if total_duration > 0:
+                    duration = max(0.0, min(duration, total_duration - start))
+                video_input, graph = self.shorts._build_graph(
+                    image_path, duration, render_mode, bg_color,
+                    video_in=f"[vb{tag}]", audio_in=f"[wa{tag}]", tag=tag
+                )
+            else:
+                start, duration = 0.0, total_duration
+                video_input, graph = self.videos._build_graph(
+                    image_path, out.get("format", "square"), render_mode, bg_color, total_duration,
+                    video_in=f"[vb{tag}]", audio_in=f"[wa{tag}]", tag=tag
+                )
+                graph = graph.replace("{offset}", "0")
+            branches.append({"tag": tag, "input": video_input, "start": start, "duration": duration, "graph": graph, "path": path})
+
+        # Entrées : une par image distincte (les composites diffèrent selon la mise en page), puis l'audio
+        images = []
+        for branch in branches:
+            if branch["input"] not in images:
+                images.append(branch["input"])
+        audio_index = len(images)
+
+        filters = []
+        for i, image in enumerate(images):
+            users = [b for b in branches if b["input"] == image]
+            filters.append(f"[{i}:v]{still_loop(FPS)},split={len(users)}" + "".join(f"[vs{b['tag']}]" for b in users))
+        filters.append(f"[{audio_index}:a]asplit={len(branches)}" + "".join(f"[as{b['tag']}]" for b in branches))
+
+        for b in branches:
+            tag, window = b["tag"], f"start={b['start']:.3f}:duration={b['duration']:.3f}"
+            # Le découpage se fait aussi côté vidéo : les images hors fenêtre sont jetées
+            # au fil de l'eau au lieu de s'accumuler en attendant l'audio du short
+            filters.append(f"[vs{tag}]trim={window},setpts=PTS-STARTPTS[vb{tag}]")
+            filters.append(f"[as{tag}]atrim={window},asetpts=PTS-STARTPTS[wa{tag}]")
+            filters.append(b["graph"])
+
+        cmd = ["ffmpeg", "-y"]
+        for image in images:
+            cmd += ["-framerate", str(FPS), "-i", image]
+        cmd += ["-i", audio_track]
+        # Une entrée AAC positionnée par short (recherche directe dans le MP4, recopie sans ré-encodage)
+        next_input = audio_index + 1
+        for b in branches:
+            b["audio_index"] = audio_index
+            if b["start"] > 0:
+                b["audio_index"], next_input = next_input, next_input + 1
+                cmd += ["-ss", f"{b['start']:.3f}", "-t", f"{b['duration']:.3f}", "-i", audio_track]
+        cmd += ["-filter_complex", ";".join(filters)]
+        for b in branches:
+            cmd += [
+                "-map", f"[outv{b['tag']}]", "-map", f"{b['audio_index']}:a",
+                "-c:v", "libx264",
+                "-preset", "medium",
+                "-crf", "23",
+                "-tune", "stillimage",
+                "-c:a", "copy",
+                "-pix_fmt", "yuv420p",
+                "-t", f"{b['duration']:.3f}",
+                b["path"]
+            ]
+
+        videos = sum(1 for out, _, _ in pending if out["kind"] != "short")
+        print(f"🎬 [Batch {render_mode.upper()}] {videos} vidéo(s) + {len(pending) - videos} short(s) en un seul passage")
+
+        longest = max(b["duration"] for b in branches)
+
+        def report(stats):
+            if longest <= 0:
+                return
+            if progress_callback: progress_callback(stats["percent"])
+            if stats_callback: stats_callback(stats)
+
+        self.last_render = run_ffmpeg(cmd, duration=longest, on_progress=report, label=f"batch:{render_mode}:{len(branches)}")
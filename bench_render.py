@@ -0,0 +1,213 @@
+"""
+Benchmark de rendu : chaque render_mode × format sur un épisode synthétique
+(static uniquement sur les formats longs).
+
+    python bench_render.py                              # tableau lisible
+    python bench_render.py --json                       # sortie JSON
+    python bench_render.py --durations 60 --modes turbo balanced --formats short
+    python bench_render.py --modes static --durations 1800
+    python bench_render.py --save-baseline              # enregistre la référence
+    python bench_render.py --baseline bench_render_baseline.json --tolerance 0.15
+
+Tout est généré localement avec ffmpeg (lavfi) : audio (ton modulé + bruit rose)
+et pochette (mire testsrc2). Aucun accès réseau, aucun fichier de l'inbox.
+Chaque cas tourne dans un interpréteur neuf (caches froids, RSS de pointe isolé) :
+wall time, facteur temps réel, RSS de pointe (Python + ffmpeg) et taille de sortie.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RENDER_MODES = ["turbo", "balanced", "quality", "static"]
+# static vise les longs formats : un short rendu en static garde l'aspect balanced
+LONG_FORMAT_ONLY_MODES = ("static",)
+FORMATS = ["square", "landscape", "short"]
+DEFAULT_DURATIONS = [30, 120]
+SHORT_MAX_SECONDS = 58
+DEFAULT_BASELINE = "bench_render_baseline.json"
+# Écart toléré avant de signaler une régression (15 % : bruit de mesure d'une machine de bureau)
+DEFAULT_TOLERANCE = 0.15
+COMPARED_METRICS = ("wall_seconds", "peak_rss_mb")
+
+
+def make_audio(path, duration, sample_rate=44100):
+    """Ton de 220 Hz modulé (la waveform bouge) + bruit rose, encodé en MP3 comme un épisode"""
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"aevalsrc='0.6*sin(2*PI*220*t)*(0.5+0.5*sin(2*PI*0.7*t))':s={sample_rate}:d={duration}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.15:r={sample_rate}:d={duration}",
+        "-filter_complex", "amix=inputs=2:duration=shortest",
+        "-ac", "2", "-c:a", "libmp3lame", "-b:a", "128k", path
+    ], check=True)
+
+
+def make_artwork(path, size=1400):
+    """Pochette carrée détaillée (mire) : le flou et la mise à l'échelle travaillent vraiment"""
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", f"testsrc2=s={size}x{size}",
+        "-frames:v", "1", path
+    ], check=True)
+
+
+def run_case(audio_path, image_path, mode, format, duration, work_dir):
+    """Un rendu (appelé dans le processus enfant) : renvoie les mesures du cas"""
+    output_dir = os.path.join(work_dir, f"{mode}-{format}-{duration}")
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    if format == "short":
+        from shorts_generator import ShortsGenerator
+        media_seconds = min(duration, SHORT_MAX_SECONDS)
+        path = ShortsGenerator(output_dir).generate_short(
+            audio_path, image_path, start_time=0, duration=media_seconds,
+            output_filename="bench.mp4", render_mode=mode, use_cache=False
+        )
+    else:
+        from youtube_generator import YouTubeGenerator
+        media_seconds = duration
+        path = YouTubeGenerator(output_dir).generate_video(
+            audio_path, image_path, output_filename="bench.mp4", format=format,
+            render_mode=mode, use_cache=False
+        )
+    wall = time.perf_counter() - started
+
+    # ru_maxrss en Kio sous Linux ; enfants = ffmpeg (et ses décodages annexes)
+    peak_kib = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return {
+        "wall_seconds": wall,
+        "realtime_factor": media_seconds / wall if wall > 0 else None,
+        "peak_rss_mb": peak_kib / 1024,
+        "output_bytes": os.path.getsize(path),
+    }
+
+
+def measure_case(audio_path, image_path, mode, format, duration, work_dir):
+    """Lance le cas dans un interpréteur neuf et récupère sa ligne JSON"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, OPPODCAST_RENDER_LOG=os.path.join(work_dir, "render_stats.jsonl"))
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--case", audio_path, image_path, mode, format, str(duration), work_dir],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    result = {"case": case_name(mode, format, duration), "render_mode": mode, "format": format, "duration": duration}
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        result["error"] = lines[-1] if lines else "render failed"
+        return result
+    result.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return result
+
+
+def case_name(mode, format, duration):
+    return f"{mode}/{format}/{duration}s"
+
+
+def compare(results, baseline, tolerance):
+    """Cas plus lents (ou plus gourmands) que la référence au-delà de la tolérance"""
+    reference = {r["case"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        ref = reference.get(r["case"])
+        if not ref or r.get("error") or ref.get("error"):
+            continue
+        for metric in COMPARED_METRICS:
+            if ref.get(metric) and r[metric] > ref[metric] * (1 + tolerance):
+                regressions.append({
+                    "case": r["case"], "metric": metric, "baseline": ref[metric], "current": r[metric],
+                    "ratio": r[metric] / ref[metric],
+                })
+    return regressions
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--case":
+        audio_path, image_path, mode, format, duration, work_dir = sys.argv[2:8]
+        # Les logs des générateurs vont sur stderr : stdout ne porte que le résultat
+        stdout, sys.stdout = sys.stdout, sys.stderr
+        result = run_case(audio_path, image_path, mode, format, int(duration), work_dir)
+        stdout.write(json.dumps(result) + "\n")
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmark de rendu Oppodcast (hors ligne, ffmpeg seul)")
+    parser.add_argument("--durations", type=int, nargs="+", default=DEFAULT_DURATIONS, help="Durées d'épisode (secondes)")
+    parser.add_argument("--modes", nargs="+", default=RENDER_MODES, choices=RENDER_MODES)
+    parser.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Référence JSON à comparer (si elle existe)")
+    parser.add_argument("--save-baseline", action="store_true", help="Écrit les résultats comme nouvelle référence")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--keep", action="store_true", help="Conserve le dossier de travail (rendus)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="oppodcast-bench-")
+    results = []
+    try:
+        image_path = os.path.join(work_dir, "artwork.png")
+        make_artwork(image_path)
+        for duration in args.durations:
+            audio_path = os.path.join(work_dir, f"episode-{duration}s.mp3")
+            make_audio(audio_path, duration)
+            for mode in args.modes:
+                for format in args.formats:
+                    if format == "short" and mode in LONG_FORMAT_ONLY_MODES:
+                        continue
+                    if not args.json:
+                        print(f"⏱️ {case_name(mode, format, duration)} ...", flush=True)
+                    results.append(measure_case(audio_path, image_path, mode, format, duration, work_dir))
+    finally:
+        if args.keep:
+            print(f"📁 Rendus conservés : {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "created_at": time.time(),
+        "machine": {"cpus": os.cpu_count(), "platform": sys.platform},
+        "results": results,
+    }
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failed = [r for r in results if r.get("error")]
+    regressions = report.get("regressions", [])
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"\n{'cas':<28} {'wall':>8} {'x temps réel':>13} {'RSS max':>9} {'sortie':>9}")
+        for r in results:
+            if r.get("error"):
+                print(f"❌ {r['case']:<26} {r['error']}")
+                continue
+            print(f"{r['case']:<28} {r['wall_seconds']:7.2f}s {r['realtime_factor']:12.1f}x "
+                  f"{r['peak_rss_mb']:7.0f}Mo {r['output_bytes'] / 1024 ** 2:7.1f}Mo")
+        if args.save_baseline:
+            print(f"\n💾 Référence enregistrée : {args.baseline}")
+        elif baseline is None:
+            print(f"\nℹ️ Pas de référence ({args.baseline}) : lancer avec --save-baseline pour en créer une")
+        elif regressions:
+            print(f"\n⚠️ {len(regressions)} régression(s) au-delà de {args.tolerance:.0%} :")
+            for reg in regressions:
+                print(f"   {reg['case']} {reg['metric']} : {reg['baseline']:.2f} -> {reg['current']:.2f} (x{reg['ratio']:.2f})")
+        else:
+            print(f"\n✅ Aucune régression au-delà de {args.tolerance:.0%}")
+
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
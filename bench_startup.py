@@ -0,0 +1,103 @@
+"""
+Benchmark de démarrage : temps d'import à froid des modules de l'app et du worker.
+
+    python bench_startup.py                 # tableau lisible
+    python bench_startup.py --json          # sortie JSON
+    python bench_startup.py --top 25 worker vodio_uploader
+
+Chaque module est importé dans un interpréteur neuf avec `-X importtime`,
+on mesure le temps total (wall) et le coût cumulé de chaque dépendance.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+DEFAULT_MODULES = [
+    "worker",
+    "job_store",
+    "youtube_generator",
+    "shorts_generator",
+    "insta_generator",
+    "youtube_uploader",
+    "vodio_uploader",
+]
+
+
+def measure_module(module, repeat=3):
+    """Import à froid de `module` : meilleur wall time sur `repeat` essais + coût par dépendance (µs)"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    best_wall, import_costs, error = None, {}, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd, capture_output=True, text=True
+        )
+        wall = time.perf_counter() - started
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed"
+            break
+        if best_wall is None or wall < best_wall:
+            best_wall = wall
+            import_costs = parse_importtime(proc.stderr)
+    return {"module": module, "wall_seconds": best_wall, "imports_us": import_costs, "error": error}
+
+
+def parse_importtime(stderr):
+    """Lignes 'import time: self [us] | cumulative | imported package' -> {package: cumulative_us}"""
+    costs = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            costs[name.strip()] = int(cumulative_us)
+        except ValueError:
+            continue
+    return costs
+
+
+def baseline_interpreter(repeat=3):
+    """Coût d'un `python -c pass` : à soustraire pour isoler le coût des imports"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], capture_output=True)
+        wall = time.perf_counter() - started
+        best = wall if best is None else min(best, wall)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps d'import à froid des modules Oppodcast")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10, help="Nombre de dépendances les plus coûteuses affichées")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    interpreter = baseline_interpreter(args.repeat)
+    results = [measure_module(m, args.repeat) for m in args.modules]
+
+    if args.json:
+        for r in results:
+            r["imports_us"] = dict(sorted(r["imports_us"].items(), key=lambda kv: -kv[1])[:args.top])
+        print(json.dumps({"interpreter_seconds": interpreter, "modules": results}, indent=2))
+        return
+
+    print(f"Interpréteur nu : {interpreter * 1000:.1f} ms")
+    for r in results:
+        if r["error"]:
+            print(f"\n❌ {r['module']} : {r['error']}")
+            continue
+        print(f"\n📦 {r['module']} : {r['wall_seconds'] * 1000:.1f} ms "
+              f"(+{(r['wall_seconds'] - interpreter) * 1000:.1f} ms vs interpréteur)")
+        for name, us in sorted(r["imports_us"].items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"   {us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
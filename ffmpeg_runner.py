@@ -0,0 +1,174 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+
+from render_governor import RenderThrottle, governed_command, policy
+
+# --- EXÉCUTION FFMPEG ---
+# Un seul point d'entrée pour tous les rendus : la progression est lue en clé=valeur
+# sur un pipe dédié (-progress), stderr n'est plus affiché ligne à ligne mais gardé
+# dans un tampon circulaire joint aux erreurs, et chaque rendu laisse une ligne de
+# statistiques (facteur temps réel compris) dans le journal des rendus.
+STDERR_TAIL_LINES = 200
+RENDER_LOG = os.environ.get("OPPODCAST_RENDER_LOG", os.path.join("generated", "render_stats.jsonl"))
+
+# ffmpeg en cours dans ce processus. Un job de rendu a son processus pour lui seul
+# (slot du pool ou worker en série) : abort_renders() n'interrompt donc que ce job.
+_RUNNING = set()
+_RUNNING_GUARD = threading.Lock()
+_ABORTED = threading.Event()
+
+
+class FFmpegError(RuntimeError):
+    def __init__(self, returncode, stderr_tail):
+        self.returncode = returncode
+        self.stderr_tail = stderr_tail
+        last_lines = "\n".join(stderr_tail[-10:])
+        super().__init__(f"FFmpeg Error (code {returncode})\n{last_lines}")
+
+
+class RenderAborted(RuntimeError):
+    """Rendu interrompu par abort_renders() (bail du job perdu)"""
+
+
+def abort_renders():
+    """Tue les ffmpeg en cours et refuse d'en lancer d'autres jusqu'à reset_abort()"""
+    with _RUNNING_GUARD:
+        _ABORTED.set()
+        processes = list(_RUNNING)
+    for process in processes:
+        process.kill()
+
+
+def reset_abort():
+    _ABORTED.clear()
+
+
+def _parse_block(block, duration):
+    """Bloc -progress (clés brutes) -> statistiques typées"""
+    def number(key, cast=float):
+        value = block.get(key, "").strip().rstrip("x")
+        try:
+            return cast(value)
+        except ValueError:
+            return None
+
+    out_time_us = number("out_time_us", int)
+    if out_time_us is None:
+        out_time_us = number("out_time_ms", int)  # en µs malgré son nom
+    stats = {
+        "out_time": max(out_time_us, 0) / 1e6 if out_time_us is not None else 0.0,
+        "frames": number("frame", int),
+        "fps": number("fps"),
+        "speed": number("speed"),
+        "bitrate": block.get("bitrate"),
+        "total_size": number("total_size", int),
+        "dropped": number("drop_frames", int),
+        "duplicated": number("dup_frames", int),
+    }
+    if duration:
+        stats["percent"] = min(int(stats["out_time"] / duration * 100), 99)
+        if stats["speed"]:
+            stats["eta"] = max(duration - stats["out_time"], 0.0) / stats["speed"]
+    return stats
+
+
+def record_render(entry, log_path=RENDER_LOG):
+    """Ajoute une ligne au journal JSON des rendus (analyse a posteriori des performances)"""
+    if not log_path:
+        return
+    try:
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError:
+        pass
+
+
+def run_ffmpeg(cmd, duration=None, on_progress=None, stdin_writer=None, label=None, log_path=RENDER_LOG):
+    """
+    Lance cmd (["ffmpeg", ...]) et renvoie les statistiques finales.
+    duration : durée média attendue (secondes) pour percent/eta.
+    on_progress(stats) : à chaque bloc -progress (out_time, frames, fps, speed, dropped, percent, eta...).
+    stdin_writer(stream) : alimente pipe:0 depuis un thread (images brutes).
+    Lève FFmpegError (avec la fin de stderr) si ffmpeg échoue, RenderAborted après abort_renders().
+    """
+    if _ABORTED.is_set():
+        raise RenderAborted(f"Rendu annulé avant démarrage : {label or cmd[-1]}")
+    read_fd, write_fd = os.pipe()
+    rules = policy()
+    full_cmd = governed_command([cmd[0], "-nostats", "-progress", f"pipe:{write_fd}", *cmd[1:]], rules)
+
+    started = time.time()
+    try:
+        process = subprocess.Popen(
+            full_cmd, stdin=subprocess.PIPE if stdin_writer else subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, pass_fds=(write_fd,)
+        )
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+    with _RUNNING_GUARD:
+        _RUNNING.add(process)
+        if _ABORTED.is_set():
+            process.kill()
+    throttle = RenderThrottle(process, rules).start()
+
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    def drain_stderr():
+        for raw in process.stderr:
+            stderr_tail.append(raw.decode("utf-8", "replace").rstrip())
+
+    threads = [threading.Thread(target=drain_stderr, daemon=True)]
+    if stdin_writer:
+        threads.append(threading.Thread(target=stdin_writer, args=(process.stdin,), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    stats, block = {"out_time": 0.0}, {}
+    progress = os.fdopen(read_fd, "r", encoding="utf-8", errors="replace")
+    try:
+        for line in progress:
+            key, _, value = line.strip().partition("=")
+            if not key:
+                continue
+            block[key] = value
+            # Chaque bloc se termine par progress=continue (ou progress=end)
+            if key == "progress":
+                stats = _parse_block(block, duration)
+                block = {}
+                if on_progress:
+                    on_progress(stats)
+        process.wait()
+    except BaseException:
+        # on_progress peut lever (rerun/stop Streamlit, Ctrl+C) : pas de ffmpeg orphelin
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        progress.close()
+        with _RUNNING_GUARD:
+            _RUNNING.discard(process)
+        throttle.stop()
+        for thread in threads:
+            thread.join()
+
+    wall = time.time() - started
+    stats["wall"] = wall
+    stats["realtime_factor"] = stats["out_time"] / wall if wall > 0 else None
+    record_render({
+        "at": started, "label": label, "returncode": process.returncode, "wall": wall, "live": throttle.live,
+        **{k: stats.get(k) for k in ("out_time", "realtime_factor", "frames", "fps", "speed", "dropped", "duplicated", "total_size")}
+    }, log_path)
+
+    if process.returncode != 0 and _ABORTED.is_set():
+        raise RenderAborted(f"Rendu interrompu : {label or cmd[-1]}")
+    if process.returncode != 0:
+        raise FFmpegError(process.returncode, list(stderr_tail))
+    return stats
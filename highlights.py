@@ -0,0 +1,86 @@
+import numpy as np
+
+from audio_analysis import ANALYSIS_SAMPLE_RATE, PCM_CACHE_DIR, decode_pcm
+
+# --- DÉTECTION DES MOMENTS FORTS ---
+# Propose des débuts de shorts : l'épisode (PCM mono en cache, mappé en mémoire) est
+# découpé en trames de 100 ms, décrites par trois indicateurs vectorisés :
+#   - énergie : niveau RMS en dB
+#   - activité vocale : part de l'énergie dans la bande de la voix (300-3400 Hz),
+#     comptée seulement au-dessus du bruit de fond
+#   - dynamique : variations du niveau (rires, échanges animés, emphase)
+# Chaque fenêtre de la durée demandée est notée par moyennes glissantes (sommes cumulées).
+FRAME_SECONDS = 0.1
+VOICE_BAND = (300, 3400)
+WEIGHTS = {"energy": 1.0, "speech": 1.5, "dynamics": 1.0}
+
+
+def frame_features(pcm, sample_rate=ANALYSIS_SAMPLE_RATE, frame_seconds=FRAME_SECONDS, block_frames=6000):
+    """(énergie dB, ratio voix, |Δ énergie|) par trame, calculés par blocs pour borner la mémoire"""
+    hop = int(sample_rate * frame_seconds)
+    n = len(pcm) // hop
+    energy = np.empty(n, dtype=np.float32)
+    voice = np.empty(n, dtype=np.float32)
+
+    freqs = np.fft.rfftfreq(hop, 1.0 / sample_rate)
+    band = (freqs >= VOICE_BAND[0]) & (freqs <= VOICE_BAND[1])
+    window = np.hanning(hop).astype(np.float32)
+
+    for first in range(0, n, block_frames):
+        count = min(block_frames, n - first)
+        frames = np.asarray(pcm[first * hop:(first + count) * hop], dtype=np.float32).reshape(count, hop) / 32768.0
+        energy[first:first + count] = 10 * np.log10((frames * frames).mean(axis=1) + 1e-10)
+        spectrum = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+        voice[first:first + count] = spectrum[:, band].sum(axis=1) / (spectrum.sum(axis=1) + 1e-10)
+
+    # Bruit de fond : 20e centile du niveau ; en dessous (+6 dB), la trame est considérée muette
+    active = energy > np.percentile(energy, 20) + 6 if n else energy > 0
+    speech = voice * active
+    dynamics = np.abs(np.diff(energy, prepend=energy[:1])) if n else energy
+    return energy, speech, dynamics
+
+
+def _window_means(values, width):
+    """Moyenne de chaque fenêtre [i, i + width) pour tous les i (somme cumulée)"""
+    cumsum = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    return (cumsum[width:] - cumsum[:-width]) / width
+
+
+def _zscore(values):
+    std = values.std()
+    return (values - values.mean()) / std if std > 0 else np.zeros_like(values)
+
+
+def find_highlights(audio_path, duration=58, top_k=5, min_gap=None, step_seconds=1.0, cache_dir=PCM_CACHE_DIR):
+    """
+    Top-K fenêtres de `duration` secondes, sans chevauchement (écart mini : min_gap, défaut = duration).
+    Renvoie [{"start_time", "duration", "score"}] trié par score décroissant,
+    directement utilisable par ShortsGenerator.generate_short(start_time=..., duration=...).
+    """
+    energy, speech, dynamics = frame_features(decode_pcm(audio_path, cache_dir=cache_dir))
+    width = int(round(duration / FRAME_SECONDS))
+    if len(energy) <= width:
+        return [{"start_time": 0.0, "duration": float(duration), "score": 0.0}] if len(energy) else []
+
+    score = (
+        WEIGHTS["energy"] * _zscore(_window_means(energy, width))
+        + WEIGHTS["speech"] * _zscore(_window_means(speech, width))
+        + WEIGHTS["dynamics"] * _zscore(_window_means(dynamics, width))
+    )
+    # Débuts candidats toutes les step_seconds (les voisins immédiats sont quasi identiques)
+    step = max(1, int(round(step_seconds / FRAME_SECONDS)))
+    starts = np.arange(0, len(score), step)
+    order = starts[np.argsort(score[starts])[::-1]]
+
+    gap = int(round((min_gap if min_gap is not None else duration) / FRAME_SECONDS))
+    picks = []
+    for start in order:
+        if all(abs(int(start) - chosen) >= gap for chosen in picks):
+            picks.append(int(start))
+            if len(picks) == top_k:
+                break
+
+    return [
+        {"start_time": round(start * FRAME_SECONDS, 1), "duration": float(duration), "score": round(float(score[start]), 2)}
+        for start in picks
+    ]
@@ -0,0 +1,774 @@
+import gzip
+import json
+import os
+import select
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+# --- CONFIGURATION ---
+JOBS_DB = os.environ.get("OPPODCAST_JOBS_DB", "jobs.db")
+LEGACY_JOBS_FILE = "jobs.json"
+# Un socket de réveil par worker dans ce dossier : notify_workers() les réveille tous
+WAKEUP_DIR = os.environ.get("OPPODCAST_WAKEUP_DIR", f"{JOBS_DB}.wakeup")
+POLL_INTERVAL = float(os.environ.get("OPPODCAST_POLL_INTERVAL", "10"))
+
+# Rétention : les jobs terminés au-delà de N jours / N jobs partent dans l'archive
+ARCHIVE_FILE = os.environ.get("OPPODCAST_JOBS_ARCHIVE", "jobs_archive.jsonl.gz")
+RETENTION_DAYS = float(os.environ.get("OPPODCAST_RETENTION_DAYS", "30"))
+RETENTION_JOBS = int(os.environ.get("OPPODCAST_RETENTION_JOBS", "500"))
+TERMINAL_STATUSES = ["completed", "failed"]
+
+# Baux (leases) : un job réservé doit être renouvelé par heartbeat, sinon il est repris
+LEASE_SECONDS = float(os.environ.get("OPPODCAST_LEASE_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.environ.get("OPPODCAST_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF = float(os.environ.get("OPPODCAST_RETRY_BACKOFF", "30"))
+
+# Ordonnancement : priorité (plus haut = plus urgent), puis échéance la plus proche.
+# Le vieillissement ajoute +1 niveau par AGING_SECONDS d'attente (pas de famine).
+PRIORITIES = {"low": 0, "normal": 1, "high": 2, "urgent": 3}
+DEFAULT_PRIORITY = PRIORITIES["normal"]
+AGING_SECONDS = float(os.environ.get("OPPODCAST_AGING_SECONDS", "3600"))
+
+# Colonnes ajoutées après la première version du schéma (migrées par ALTER TABLE)
+EXTRA_COLUMNS = {
+    "attempts": "INTEGER",
+    "max_attempts": "INTEGER",
+    "next_attempt_at": "REAL",
+    "lease_owner": "TEXT",
+    "lease_expires_at": "REAL",
+    "priority": "INTEGER",
+    "deadline": "REAL",
+    "parent_id": "TEXT",
+}
+
+# Colonnes "indexables" : le reste du job est stocké en JSON dans payload
+JOB_COLUMNS = ["id", "type", "status", "created_at", "started_at", "finished_at", "progress", "error"] + list(EXTRA_COLUMNS)
+COLUMN_DEFAULTS = {"status": "pending", "progress": 0, "attempts": 0, "max_attempts": MAX_ATTEMPTS, "priority": DEFAULT_PRIORITY}
+
+# Étape de pipeline dont un parent n'est pas encore 'completed' : pas réservable
+DEPS_PENDING = """EXISTS (
+    SELECT 1 FROM job_deps d JOIN jobs p ON p.id = d.depends_on
+    WHERE d.job_id = jobs.id AND p.status != 'completed'
+)"""
+
+# Priorité effective (avec vieillissement), puis échéance (sans échéance en dernier), puis ancienneté
+SCHEDULE_ORDER = (
+    "ORDER BY COALESCE(priority, 0) + CAST((:now - created_at) / :aging AS INTEGER) DESC, "
+    "deadline IS NULL, deadline, created_at"
+)
+
+
+class JobStore(ABC):
+    """
+    Interface commune des backends de file d'attente.
+    Un job est toujours manipulé comme un dict (mêmes clés que l'ancien jobs.json), avec en
+    colonnes d'ordonnancement : priority, deadline, parent_id, attempts/max_attempts,
+    next_attempt_at, lease_owner/lease_expires_at ; depends_on liste les ids des étapes amont.
+    """
+
+    @abstractmethod
+    def add_job(self, job_data):
+        """Insère (ou remplace) un job et réveille les workers ; renvoie son id"""
+
+    @abstractmethod
+    def add_jobs(self, jobs_data, replace=False):
+        """Insère plusieurs jobs et leurs depends_on en une transaction ; renvoie leurs ids"""
+
+    @abstractmethod
+    def get_job(self, job_id):
+        """Le job, ou None"""
+
+    @abstractmethod
+    def list_jobs(self, status=None, job_type=None, since=None, limit=None, parent_id=None):
+        """Jobs filtrés, par date de création"""
+
+    @abstractmethod
+    def claim_next_pending(self, job_types=None, owner=None, lease_seconds=LEASE_SECONDS):
+        """Réserve le prochain job prêt (priorité, échéance) sous un bail ; None si aucun"""
+
+    @abstractmethod
+    def heartbeat(self, job_id, owner, lease_seconds=LEASE_SECONDS):
+        """Renouvelle le bail ; False si le job n'appartient plus à owner"""
+
+    @abstractmethod
+    def retry_or_fail(self, job_id, error_msg, owner=None, retry=True):
+        """Remet le job en file avec backoff (si retry) ou le passe en 'failed' ; None si bail perdu"""
+
+    @abstractmethod
+    def reclaim_expired(self):
+        """Reprend les jobs dont le bail a expiré ; renvoie leur nombre"""
+
+    @abstractmethod
+    def next_wakeup_delay(self, max_delay=POLL_INTERVAL):
+        """Secondes avant la prochaine fin de backoff ou de bail, plafonnées à max_delay"""
+
+    @abstractmethod
+    def update_job(self, job_id, **fields):
+        """Met à jour colonnes et champs du payload ; False si le job n'existe pas"""
+
+    @abstractmethod
+    def update_owned_job(self, job_id, owner, **fields):
+        """Comme update_job, seulement sous le bail de owner ; False sinon"""
+
+    @abstractmethod
+    def update_progress(self, job_id, progress):
+        """Met à jour la seule progression"""
+
+    @abstractmethod
+    def count_by_status(self):
+        """{(type, statut): nombre}"""
+
+    @abstractmethod
+    def queue_order(self, job_types=None):
+        """Jobs en attente, prêts d'abord dans l'ordre de réservation (job["blocked"] sinon)"""
+
+    @abstractmethod
+    def average_run_times(self):
+        """{type: durée moyenne d'exécution}"""
+
+    @abstractmethod
+    def compact(self, max_age_days=RETENTION_DAYS, max_jobs=RETENTION_JOBS, archive_file=ARCHIVE_FILE):
+        """Archive les vieux jobs terminés ; renvoie leur nombre"""
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Backend SQLite (mode WAL) : lectures indexées, claim atomique,
+    mises à jour ligne par ligne au lieu de réécrire tout le fichier.
+    """
+
+    def __init__(self, db_path=JOBS_DB, legacy_file=LEGACY_JOBS_FILE):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_schema()
+        if legacy_file:
+            self.migrate_from_json(legacy_file)
+
+    # --- CONNEXION ---
+    def _conn(self):
+        # Une connexion par thread (sqlite3 n'aime pas le partage entre threads)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        # Sous verrou d'écriture : le worker et l'UI peuvent créer/migrer le schéma en même temps
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._create_tables(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _create_tables(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                payload TEXT NOT NULL DEFAULT '{}'
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_type_status ON jobs(type, status)")
+        existing = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+        for name, sql_type in EXTRA_COLUMNS.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {sql_type}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(status, lease_expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_parent ON jobs(parent_id)")
+        # Dépendances entre jobs (pipelines) : un job n'est réservable que si tous ses parents sont 'completed'
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_deps (
+                job_id TEXT NOT NULL,
+                depends_on TEXT NOT NULL,
+                PRIMARY KEY (job_id, depends_on)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_deps_depends_on ON job_deps(depends_on)")
+
+    # --- SÉRIALISATION ---
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = json.loads(row["payload"] or "{}")
+        for col in JOB_COLUMNS:
+            if row[col] is not None or col not in job:
+                job[col] = row[col]
+        return job
+
+    def _split_job(self, job_data):
+        columns = {col: job_data.get(col) for col in JOB_COLUMNS}
+        for col, default in COLUMN_DEFAULTS.items():
+            if columns[col] is None:
+                columns[col] = default
+        columns["created_at"] = columns["created_at"] or time.time()
+        payload = {k: v for k, v in job_data.items() if k not in JOB_COLUMNS}
+        return columns, json.dumps(payload, ensure_ascii=False)
+
+    # --- API ---
+    def add_job(self, job_data):
+        return self.add_jobs([job_data], replace=True)[0]
+
+    def add_jobs(self, jobs_data, replace=False):
+        """
+        Insère plusieurs jobs (et leurs depends_on) dans une seule transaction.
+        replace=False : un job déjà présent est conservé tel quel (expansion idempotente).
+        """
+        names = JOB_COLUMNS + ["payload"]
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for job_data in jobs_data:
+                columns, payload = self._split_job(job_data)
+                conn.execute(
+                    f"{verb} INTO jobs ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                    [columns[c] for c in JOB_COLUMNS] + [payload]
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO job_deps (job_id, depends_on) VALUES (?, ?)",
+                    [(job_data["id"], dep) for dep in job_data.get("depends_on", [])]
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        notify_workers()
+        return [job_data["id"] for job_data in jobs_data]
+
+    def get_job(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def list_jobs(self, status=None, job_type=None, since=None, limit=None, parent_id=None):
+        """since : ne renvoie que les jobs créés ou terminés après ce timestamp"""
+        query, params = "SELECT * FROM jobs WHERE 1=1", []
+        if status:
+            statuses = [status] if isinstance(status, str) else list(status)
+            query += f" AND status IN ({', '.join('?' * len(statuses))})"
+            params += statuses
+        if job_type:
+            query += " AND type = ?"
+            params.append(job_type)
+        if parent_id:
+            query += " AND parent_id = ?"
+            params.append(parent_id)
+        if since is not None:
+            query += " AND (created_at >= ? OR finished_at >= ?)"
+            params += [since, since]
+        query += " ORDER BY created_at"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [self._row_to_job(r) for r in self._conn().execute(query, params)]
+
+    def claim_next_pending(self, job_types=None, owner=None, lease_seconds=LEASE_SECONDS):
+        """
+        Passe atomiquement le prochain job 'pending' prêt (hors backoff, étapes amont terminées)
+        en 'processing' sous un bail de lease_seconds au nom de owner, et le renvoie.
+        Ordre : priorité effective (vieillissement compris), puis échéance, puis ancienneté.
+        Les baux expirés sont repris dans la même transaction.
+        """
+        conn = self._conn()
+        now = time.time()
+        query, params = self._pending_query(job_types, now, ready_only=True)
+        query += " LIMIT 1"
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._reclaim_expired(conn, now)
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                """UPDATE jobs SET status = 'processing', progress = 0, started_at = ?,
+                       attempts = COALESCE(attempts, 0) + 1, lease_owner = ?, lease_expires_at = ?
+                   WHERE id = ?""",
+                (now, owner, now + lease_seconds, row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get_job(row["id"])
+
+    def _pending_query(self, job_types, now, ready_only=False, columns="*"):
+        query = f"SELECT {columns} FROM jobs WHERE status = 'pending'"
+        params = {"now": now, "aging": AGING_SECONDS}
+        if ready_only:
+            query += f" AND COALESCE(next_attempt_at, 0) <= :now AND NOT {DEPS_PENDING}"
+        if job_types:
+            names = [f"t{i}" for i in range(len(job_types))]
+            query += f" AND type IN ({', '.join(':' + n for n in names)})"
+            params.update(zip(names, job_types))
+        return f"{query} {SCHEDULE_ORDER}", params
+
+    def queue_order(self, job_types=None):
+        """
+        Jobs en attente : d'abord les jobs prêts, dans l'ordre où le worker les prendra,
+        puis les autres avec job["blocked"] = "deps" (étape amont non terminée)
+        ou "retry" (backoff en cours) ; None pour un job prêt.
+        """
+        blocked = f"CASE WHEN {DEPS_PENDING} THEN 'deps' WHEN COALESCE(next_attempt_at, 0) > :now THEN 'retry' END"
+        query, params = self._pending_query(job_types, time.time(), columns=f"*, {blocked} AS blocked")
+        jobs = []
+        for row in self._conn().execute(query, params):
+            job = self._row_to_job(row)
+            job["blocked"] = row["blocked"]
+            jobs.append(job)
+        # Tri stable : l'ordre du scheduler est conservé dans chaque groupe
+        jobs.sort(key=lambda job: job["blocked"] is not None)
+        return jobs
+
+    def average_run_times(self):
+        """Durée moyenne d'exécution par type, calculée sur les jobs terminés encore en base"""
+        rows = self._conn().execute(
+            """SELECT type, AVG(finished_at - started_at) AS avg_run FROM jobs
+               WHERE status = 'completed' AND started_at IS NOT NULL AND finished_at IS NOT NULL
+               GROUP BY type"""
+        )
+        return {r["type"]: r["avg_run"] for r in rows}
+
+    def heartbeat(self, job_id, owner, lease_seconds=LEASE_SECONDS):
+        """Renouvelle le bail. Renvoie False si le job ne nous appartient plus"""
+        cur = self._conn().execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = 'processing' AND lease_owner IS ?",
+            (time.time() + lease_seconds, job_id, owner)
+        )
+        return cur.rowcount > 0
+
+    def retry_or_fail(self, job_id, error_msg, owner=None, retry=True):
+        """
+        Échec d'une tentative : remet le job en 'pending' avec un backoff exponentiel
+        tant qu'il reste des tentatives, sinon le passe en 'failed'. Avec retry=False
+        (erreur définitive), le job échoue tout de suite. Renvoie le statut appliqué.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT attempts, max_attempts, lease_owner FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None or (owner is not None and row["lease_owner"] != owner):
+                # Bail perdu entre-temps : un autre worker a repris le job
+                conn.execute("COMMIT")
+                return None
+            status = self._apply_retry(conn, job_id, row["attempts"], row["max_attempts"], error_msg, time.time(), retry)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return status
+
+    def reclaim_expired(self):
+        """Reprend les jobs 'processing' dont le bail a expiré (worker mort, conteneur redémarré)"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            count = self._reclaim_expired(conn, time.time())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def next_wakeup_delay(self, max_delay=POLL_INTERVAL):
+        """
+        Délai avant la prochaine échéance future (fin de backoff ou de bail), plafonné à max_delay.
+        Un job déjà prêt mais non réservable (voie pleine) n'est pas une échéance : c'est la fin
+        d'un slot ou notify_workers() qui réveille alors le dispatcher, pas un polling serré.
+        """
+        now = time.time()
+        row = self._conn().execute(
+            """SELECT MIN(t) AS t FROM (
+                   SELECT MIN(next_attempt_at) AS t FROM jobs WHERE status = 'pending' AND next_attempt_at > :now
+                   UNION ALL
+                   SELECT MIN(lease_expires_at) AS t FROM jobs WHERE status = 'processing' AND lease_expires_at > :now
+               )""",
+            {"now": now}
+        ).fetchone()
+        if row is None or row["t"] is None:
+            return max_delay
+        return min(row["t"] - now, max_delay)
+
+    def _reclaim_expired(self, conn, now):
+        rows = conn.execute(
+            """SELECT id, attempts, max_attempts, lease_owner FROM jobs
+               WHERE status = 'processing' AND COALESCE(lease_expires_at, 0) < ?""",
+            (now,)
+        ).fetchall()
+        for row in rows:
+            print(f"♻️ Bail expiré pour le job {row['id']} (worker {row['lease_owner']}), reprise")
+            self._apply_retry(conn, row["id"], row["attempts"], row["max_attempts"], "Bail expiré (worker interrompu)", now)
+        return len(rows)
+
+    def _apply_retry(self, conn, job_id, attempts, max_attempts, error_msg, now, retry=True):
+        attempts = attempts or 0
+        if retry and attempts < (max_attempts or MAX_ATTEMPTS):
+            delay = RETRY_BACKOFF * (2 ** max(attempts - 1, 0))
+            conn.execute(
+                """UPDATE jobs SET status = 'pending', error = ?, next_attempt_at = ?,
+                       lease_owner = NULL, lease_expires_at = NULL WHERE id = ?""",
+                (error_msg, now + delay, job_id)
+            )
+            return "pending"
+        conn.execute(
+            """UPDATE jobs SET status = 'failed', error = ?, finished_at = ?,
+                   lease_owner = NULL, lease_expires_at = NULL WHERE id = ?""",
+            (error_msg, now, job_id)
+        )
+        self._fail_dependents(conn, job_id, now)
+        return "failed"
+
+    def _fail_dependents(self, conn, job_id, now):
+        """Un échec définitif annule en cascade les étapes qui en dépendent"""
+        pending = [job_id]
+        while pending:
+            current = pending.pop()
+            rows = conn.execute(
+                """SELECT j.id FROM job_deps d JOIN jobs j ON j.id = d.job_id
+                   WHERE d.depends_on = ? AND j.status = 'pending'""",
+                (current,)
+            ).fetchall()
+            for row in rows:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                    (f"Étape amont en échec : {current}", now, row["id"])
+                )
+                pending.append(row["id"])
+
+    def update_job(self, job_id, **fields):
+        """Met à jour des colonnes et/ou des champs du payload d'un seul job"""
+        return self._update_job(job_id, fields)
+
+    def update_owned_job(self, job_id, owner, **fields):
+        """
+        Comme update_job, mais seulement si le job est encore 'processing' sous le bail
+        de owner. Renvoie False (rien n'est écrit) si le bail a été perdu entre-temps.
+        """
+        return self._update_job(job_id, fields, fenced=True, owner=owner)
+
+    def _update_job(self, job_id, fields, fenced=False, owner=None):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT payload, status, lease_owner FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or (fenced and (row["status"] != "processing" or row["lease_owner"] != owner)):
+                conn.execute("COMMIT")
+                return False
+            sets, params = [], []
+            payload = json.loads(row["payload"] or "{}")
+            payload_changed = False
+            for key, value in fields.items():
+                if key == "id":
+                    continue
+                if key in JOB_COLUMNS:
+                    sets.append(f"{key} = ?")
+                    params.append(value)
+                else:
+                    payload[key] = value
+                    payload_changed = True
+            if payload_changed:
+                sets.append("payload = ?")
+                params.append(json.dumps(payload, ensure_ascii=False))
+            if sets:
+                conn.execute(f"UPDATE jobs SET {', '.join(sets)} WHERE id = ?", params + [job_id])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def update_progress(self, job_id, progress):
+        """Chemin rapide : une seule colonne, pas de relecture du payload"""
+        self._conn().execute("UPDATE jobs SET progress = ? WHERE id = ?", (progress, job_id))
+
+    def count_by_status(self):
+        rows = self._conn().execute("SELECT type, status, COUNT(*) AS n FROM jobs GROUP BY type, status")
+        return {(r["type"], r["status"]): r["n"] for r in rows}
+
+    # --- RÉTENTION ---
+    def compact(self, max_age_days=RETENTION_DAYS, max_jobs=RETENTION_JOBS, archive_file=ARCHIVE_FILE):
+        """
+        Déplace les jobs terminés trop vieux (ou au-delà des max_jobs plus récents)
+        vers l'archive gzip append-only, puis les supprime de la table chaude.
+        """
+        conn = self._conn()
+        cutoff = time.time() - max_age_days * 86400
+        placeholders = ", ".join("?" * len(TERMINAL_STATUSES))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"""SELECT * FROM jobs WHERE status IN ({placeholders}) AND (
+                        COALESCE(finished_at, created_at) < ?
+                        OR id NOT IN (
+                            SELECT id FROM jobs WHERE status IN ({placeholders})
+                            ORDER BY COALESCE(finished_at, created_at) DESC LIMIT ?
+                        )
+                    ) ORDER BY created_at""",
+                TERMINAL_STATUSES + [cutoff] + TERMINAL_STATUSES + [max_jobs]
+            ).fetchall()
+            if rows:
+                # Un membre gzip par compaction : le fichier reste lisible d'une traite
+                lines = "".join(json.dumps(self._row_to_job(r), ensure_ascii=False) + "\n" for r in rows)
+                with gzip.open(archive_file, "at", encoding="utf-8") as f:
+                    f.write(lines)
+                conn.executemany("DELETE FROM jobs WHERE id = ?", [(r["id"],) for r in rows])
+                conn.executemany("DELETE FROM job_deps WHERE job_id = ?", [(r["id"],) for r in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if rows:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            print(f"🗄️ Compaction : {len(rows)} job(s) archivé(s) dans {archive_file}")
+        return len(rows)
+
+    # --- MIGRATION ---
+    def migrate_from_json(self, legacy_file):
+        """Import unique de l'ancien jobs.json (renommé ensuite en .migrated)"""
+        if not os.path.exists(legacy_file):
+            return 0
+
+        count = 0
+        conn = self._conn()
+        # Lecture et renommage sous le verrou d'écriture : le worker et l'UI migrent au démarrage,
+        # le second trouve le fichier déjà renommé et ne fait rien
+        conn.execute("BEGIN IMMEDIATE")
+        migrated = False
+        try:
+            try:
+                with open(legacy_file, "r") as f:
+                    jobs = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                conn.execute("ROLLBACK")
+                return 0
+            for jid, data in jobs.items():
+                if not isinstance(data, dict) or "type" not in data:
+                    continue
+                data = dict(data, id=data.get("id", jid))
+                columns, payload = self._split_job(data)
+                names = JOB_COLUMNS + ["payload"]
+                conn.execute(
+                    f"INSERT OR IGNORE INTO jobs ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                    [columns[c] for c in JOB_COLUMNS] + [payload]
+                )
+                count += 1
+            os.replace(legacy_file, f"{legacy_file}.migrated")
+            migrated = True
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            if migrated:
+                os.replace(f"{legacy_file}.migrated", legacy_file)
+            raise
+        print(f"📦 Migration jobs.json -> {self.db_path} : {count} job(s) importé(s)")
+        return count
+
+
+def estimate_start_times(store, lanes, default_run=300):
+    """
+    Estime l'heure de démarrage de chaque job en attente (ordre du scheduler),
+    à partir des durées moyennes observées et des voies réelles du worker :
+    lanes est une liste de {"types": [...] ou None (tous), "slots": n, "limits": {type: n}}.
+    Un job bloqué ne démarre pas avant la fin de son backoff ni la fin estimée de ses
+    étapes amont (placées avant lui). Renvoie une liste de (job, timestamp de démarrage estimé).
+    """
+    now = time.time()
+    averages = store.average_run_times()
+
+    def lane_of(job_type):
+        for lane in lanes:
+            if lane.get("types") is None or job_type in lane["types"]:
+                return lane
+        return None
+
+    # Instant où chaque slot se libère (par voie, et par type quand il est plafonné),
+    # initialisé avec les jobs en cours
+    free_at, ends = {}, {}
+
+    def slot_lists(job_type):
+        lane = lane_of(job_type)
+        if lane is None:
+            keys = [(("type", job_type), 1)]  # type inconnu des voies : une voie à lui
+        else:
+            keys = [(("lane", id(lane)), lane["slots"])]
+            limit = lane.get("limits", {}).get(job_type)
+            if limit is not None and limit < lane["slots"]:
+                keys.append((("type", job_type), limit))
+        return [(free_at.setdefault(key, []), size) for key, size in keys]
+
+    for job in store.list_jobs(status="processing"):
+        run = averages.get(job["type"], default_run)
+        ends[job["id"]] = max((job.get("started_at") or now) + run, now)
+        for slots, _ in slot_lists(job["type"]):
+            slots.append(ends[job["id"]])
+
+    estimates = []
+
+    def place(job):
+        lists = slot_lists(job["type"])
+        for slots, size in lists:
+            while len(slots) < size:
+                slots.append(now)
+            slots.sort()
+        deps_end = [ends.get(dep, now) for dep in job.get("depends_on", [])]
+        start = max(job.get("next_attempt_at") or now, *deps_end, *(slots[0] for slots, _ in lists))
+        ends[job["id"]] = start + averages.get(job["type"], default_run)
+        for slots, _ in lists:
+            slots[0] = ends[job["id"]]
+        estimates.append((job, start))
+
+    queue = store.queue_order()
+    queued_ids = {job["id"] for job in queue}
+    while queue:
+        deferred = []
+        for job in queue:
+            # Une étape attend que ses étapes amont encore en file aient été placées
+            if any(dep in queued_ids and dep not in ends for dep in job.get("depends_on", [])):
+                deferred.append(job)
+            else:
+                place(job)
+        if len(deferred) == len(queue):
+            place(deferred.pop(0))  # dépendance circulaire : on force l'avancée
+        queue = deferred
+    return estimates
+
+
+def query_archive(job_id=None, job_type=None, status=None, since=None, until=None, limit=None, archive_file=ARCHIVE_FILE):
+    """Parcourt l'archive à la demande (lecture séquentielle, hors du chemin chaud)"""
+    if not os.path.exists(archive_file):
+        return []
+    results, seen = [], set()
+    with gzip.open(archive_file, "rt", encoding="utf-8") as f:
+        for line in f:
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            # Une compaction interrompue peut avoir écrit un job deux fois
+            if job.get("id") in seen:
+                continue
+            if job_id and job.get("id") != job_id: continue
+            if job_type and job.get("type") != job_type: continue
+            if status and job.get("status") != status: continue
+            created = job.get("created_at") or 0
+            if since is not None and created < since: continue
+            if until is not None and created >= until: continue
+            seen.add(job.get("id"))
+            results.append(job)
+            if limit and len(results) >= limit:
+                break
+    return results
+
+
+# --- RÉVEIL DES WORKERS ---
+def notify_workers(wakeup_dir=WAKEUP_DIR):
+    """Réveille tous les workers en attente (best effort : sans effet si personne n'écoute)"""
+    if not hasattr(socket, "AF_UNIX"):
+        return
+    try:
+        names = [name for name in os.listdir(wakeup_dir) if name.endswith(".sock")]
+    except OSError:
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        for name in names:
+            path = os.path.join(wakeup_dir, name)
+            try:
+                sock.sendto(b"1", path)
+            except ConnectionRefusedError:
+                # Plus personne n'écoute : socket laissé par un worker mort
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            except OSError:
+                # File pleine (le worker a déjà des réveils en attente) ou socket disparu
+                pass
+
+
+class JobWakeup:
+    """
+    Socket Unix datagramme propre à ce worker (un fichier par processus dans wakeup_dir) :
+    chaque add_job() notifie tous les workers, le polling (POLL_INTERVAL) ne sert plus
+    que de filet de sécurité.
+    """
+
+    def __init__(self, wakeup_dir=WAKEUP_DIR):
+        self.path = os.path.join(wakeup_dir, f"{os.getpid()}.sock")
+        self.sock = None
+        if not hasattr(socket, "AF_UNIX"):
+            return
+        try:
+            os.makedirs(wakeup_dir, exist_ok=True)
+            # Même pid : socket d'un ancien processus (pid recyclé), jamais celui d'un worker vivant
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.sock.bind(self.path)
+            self.sock.setblocking(False)
+        except OSError as e:
+            print(f"⚠️ Réveil par socket indisponible ({e}), polling seul")
+            self.sock = None
+
+    def wait(self, timeout=POLL_INTERVAL):
+        """Bloque jusqu'à une notification ou l'expiration du timeout. Renvoie True si notifié"""
+        if self.sock is None:
+            time.sleep(timeout)
+            return False
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if not ready:
+            return False
+        # Vide les notifications accumulées : un seul scan suffit
+        try:
+            while True:
+                self.sock.recv(64)
+        except (BlockingIOError, OSError):
+            pass
+        return True
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+_STORES = {}
+
+def get_job_store():
+    """
+    Renvoie le backend configuré (OPPODCAST_JOB_STORE, défaut 'sqlite').
+    Une instance par processus.
+    """
+    backend = os.environ.get("OPPODCAST_JOB_STORE", "sqlite")
+    key = (backend, os.getpid())
+    if key not in _STORES:
+        if backend == "sqlite":
+            _STORES[key] = SQLiteJobStore()
+        else:
+            raise ValueError(f"Backend de file d'attente inconnu : {backend}")
+    return _STORES[key]
@@ -0,0 +1,170 @@
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+
+from render_assets import file_digest
+
+# --- INDEX DES MÉDIAS DE L'INBOX ---
+# Une base SQLite par dossier (.media_index.db) : titre, durée, codec, fréquence,
+# taille et empreinte de chaque épisode. Mise à jour incrémentale (à l'ingestion, ou
+# quand la taille/mtime d'un fichier change), lue en une requête : plus de JSON ni de
+# ffprobe à chaque rerun Streamlit ni à chaque rendu, seulement un stat par fichier.
+INDEX_FILENAME = ".media_index.db"
+MEDIA_EXTENSIONS = (".mp3",)
+
+
+def probe_media(path):
+    """ffprobe unique : durée, codec, fréquence d'échantillonnage, canaux"""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "format=duration:stream=codec_name,sample_rate,channels",
+        "-of", "json", path
+    ]
+    try:
+        info = json.loads(subprocess.check_output(cmd).decode())
+    except Exception:
+        return {"duration": 0.0, "codec": None, "sample_rate": None, "channels": None}
+    stream = (info.get("streams") or [{}])[0]
+    return {
+        "duration": float(info.get("format", {}).get("duration") or 0.0),
+        "codec": stream.get("codec_name"),
+        "sample_rate": int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+        "channels": stream.get("channels"),
+    }
+
+
+def _sidecar_path(path):
+    return f"{os.path.splitext(path)[0]}.json"
+
+
+def _sidecar_mtime(path):
+    try:
+        return os.stat(_sidecar_path(path)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _sidecar_title(path):
+    """Titre de l'épisode dans le JSON écrit à l'ingestion (et mtime de ce JSON)"""
+    try:
+        with open(_sidecar_path(path), "r", encoding="utf-8") as f:
+            return json.load(f).get("title"), _sidecar_mtime(path)
+    except (OSError, ValueError):
+        return None, _sidecar_mtime(path)
+
+
+class MediaIndex:
+    def __init__(self, media_dir):
+        self.media_dir = os.path.abspath(media_dir)
+        self.db_path = os.path.join(self.media_dir, INDEX_FILENAME)
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self):
+        # Une connexion par thread, comme le job store
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS media (
+                filename TEXT PRIMARY KEY,
+                title TEXT,
+                duration REAL,
+                codec TEXT,
+                sample_rate INTEGER,
+                channels INTEGER,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                ctime REAL NOT NULL,
+                sha1 TEXT,
+                sidecar_mtime_ns INTEGER,
+                indexed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_media_ctime ON media(ctime)")
+
+    # --- MISE À JOUR ---
+    def upsert(self, path, st=None):
+        """(Ré)indexe un fichier : appelé à l'ingestion, ou par refresh() quand il a changé"""
+        path = os.path.abspath(path)
+        st = st or os.stat(path)
+        title, sidecar_mtime = _sidecar_title(path)
+        info = probe_media(path)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO media (filename, title, duration, codec, sample_rate, channels, size, mtime_ns, "
+            "ctime, sha1, sidecar_mtime_ns, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (os.path.basename(path), title, info["duration"], info["codec"], info["sample_rate"], info["channels"],
+             st.st_size, st.st_mtime_ns, st.st_ctime, file_digest(path), sidecar_mtime, time.time())
+        )
+
+    def refresh(self, force=False):
+        """
+        Synchronise l'index avec le dossier. Chaque fichier est comparé par stat (taille, mtime,
+        mtime du JSON associé) : le mtime du dossier ne voit pas les réécritures sur place.
+        Seuls les fichiers nouveaux ou modifiés sont re-sondés (tous avec force=True).
+        """
+        conn = self._conn()
+        known = {r["filename"]: r for r in conn.execute("SELECT filename, size, mtime_ns, sidecar_mtime_ns FROM media")}
+        seen, changed = set(), 0
+        with os.scandir(self.media_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.endswith(MEDIA_EXTENSIONS):
+                    continue
+                seen.add(entry.name)
+                st = entry.stat()
+                previous = known.get(entry.name)
+                if not force and previous and (previous["size"], previous["mtime_ns"], previous["sidecar_mtime_ns"]) == (st.st_size, st.st_mtime_ns, _sidecar_mtime(entry.path)):
+                    continue
+                self.upsert(entry.path, st)
+                changed += 1
+
+        gone = [name for name in known if name not in seen]
+        conn.executemany("DELETE FROM media WHERE filename = ?", [(name,) for name in gone])
+        return changed + len(gone)
+
+    # --- LECTURE ---
+    def list_media(self):
+        """Tous les épisodes, du plus récent au plus ancien (une requête)"""
+        return [dict(r) for r in self._conn().execute("SELECT * FROM media ORDER BY ctime DESC")]
+
+    def get(self, filename):
+        row = self._conn().execute("SELECT * FROM media WHERE filename = ?", (os.path.basename(filename),)).fetchone()
+        return dict(row) if row else None
+
+
+_INDEXES = {}
+
+def get_media_index(media_dir):
+    media_dir = os.path.abspath(media_dir)
+    if media_dir not in _INDEXES:
+        _INDEXES[media_dir] = MediaIndex(media_dir)
+    return _INDEXES[media_dir]
+
+
+def indexed_duration(audio_path):
+    """
+    Durée connue de l'index du dossier du fichier (None si pas d'index ou entrée périmée).
+    N'ouvre jamais de nouvel index : sans .media_index.db, le générateur garde son ffprobe.
+    """
+    media_dir = os.path.dirname(os.path.abspath(audio_path))
+    if not os.path.exists(os.path.join(media_dir, INDEX_FILENAME)):
+        return None
+    try:
+        entry = get_media_index(media_dir).get(audio_path)
+        st = os.stat(audio_path)
+    except (OSError, sqlite3.Error):
+        return None
+    if entry and entry["duration"] and (entry["size"], entry["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+        return entry["duration"]
+    return None
@@ -0,0 +1,149 @@
+import os
+import threading
+
+# --- CONFIGURATION ---
+METRICS_ADDR = os.environ.get("OPPODCAST_METRICS_ADDR", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("OPPODCAST_METRICS_PORT", "9464"))
+
+DURATION_BUCKETS = [0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200]
+REALTIME_BUCKETS = [0.25, 0.5, 1, 2, 4, 8, 16, 32, 64]
+THROUGHPUT_BUCKETS = [1e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7, 5e7, 1e8]
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name, self.help_text = name, help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels_text(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name, self.help_text, self.buckets = name, help_text, buckets
+        self._series = {}  # labels -> [compteurs par bucket, somme, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._series.setdefault(key, [[0] * len(self.buckets), [0.0, 0]])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            total[0] += value
+            total[1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, (total_sum, total_count)) in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_labels_text(key + (('le', bound),))} {count}")
+                lines.append(f"{self.name}_bucket{_labels_text(key + (('le', '+Inf'),))} {total_count}")
+                lines.append(f"{self.name}_sum{_labels_text(key)} {total_sum}")
+                lines.append(f"{self.name}_count{_labels_text(key)} {total_count}")
+        return lines
+
+
+# --- MÉTRIQUES DU WORKER ---
+JOBS_FINISHED = Counter("oppodcast_jobs_finished_total", "Jobs terminés par type et issue (completed, retry, failed, lease_lost)")
+JOB_WAIT = Histogram("oppodcast_job_wait_seconds", "Attente en file avant démarrage", DURATION_BUCKETS)
+JOB_RUN = Histogram("oppodcast_job_run_seconds", "Durée d'exécution d'un job", DURATION_BUCKETS)
+RENDER_REALTIME = Histogram(
+    "oppodcast_render_realtime_factor",
+    "Secondes de média encodées par seconde de calcul ffmpeg", REALTIME_BUCKETS
+)
+UPLOAD_BYTES = Counter("oppodcast_upload_bytes_total", "Octets envoyés par destination")
+UPLOAD_SECONDS = Counter("oppodcast_upload_seconds_total", "Temps passé à uploader par destination")
+UPLOAD_THROUGHPUT = Histogram("oppodcast_upload_throughput_bytes_per_second", "Débit par upload", THROUGHPUT_BUCKETS)
+
+ALL_METRICS = [JOBS_FINISHED, JOB_WAIT, JOB_RUN, RENDER_REALTIME, UPLOAD_BYTES, UPLOAD_SECONDS, UPLOAD_THROUGHPUT]
+
+
+def record_job(report):
+    """
+    Enregistre le rapport renvoyé par worker.run_job (dict picklable, donc
+    utilisable aussi pour les jobs exécutés dans le pool de processus).
+    """
+    if not report:
+        return
+    job_type = report["type"]
+    JOBS_FINISHED.inc(type=job_type, outcome=report["outcome"])
+    if report.get("wait") is not None:
+        JOB_WAIT.observe(report["wait"], type=job_type)
+    if report.get("run") is not None:
+        JOB_RUN.observe(report["run"], type=job_type)
+
+    render = report.get("render")
+    if render and render.get("wall"):
+        RENDER_REALTIME.observe(
+            render["media_seconds"] / render["wall"],
+            kind=render["kind"], render_mode=render["render_mode"], format=render["format"]
+        )
+
+    upload = report.get("upload")
+    if upload and upload.get("seconds"):
+        UPLOAD_BYTES.inc(upload["bytes"], target=upload["target"])
+        UPLOAD_SECONDS.inc(upload["seconds"], target=upload["target"])
+        UPLOAD_THROUGHPUT.observe(upload["bytes"] / upload["seconds"], target=upload["target"])
+
+
+def render_metrics(store=None):
+    lines = []
+    if store is not None:
+        # Profondeur de file calculée à la demande (une requête GROUP BY indexée)
+        lines += ["# HELP oppodcast_queue_jobs Jobs en base par type et statut", "# TYPE oppodcast_queue_jobs gauge"]
+        for (job_type, status), count in sorted(store.count_by_status().items()):
+            lines.append(f'oppodcast_queue_jobs{{type="{job_type}",status="{status}"}} {count}')
+    for metric in ALL_METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(store_factory, addr=METRICS_ADDR, port=METRICS_PORT):
+    """Expose /metrics (format texte Prometheus) dans un thread. port=0 : désactivé"""
+    if not port:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_metrics(store_factory()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    except OSError as e:
+        print(f"⚠️ Endpoint métriques indisponible ({e})")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📈 Métriques exposées sur http://{addr}:{port}/metrics")
+    return server
@@ -1,10 +1,18 @@
 import streamlit as st
 from jingle_palette import JinglePalette
+from render_governor import LIVE_TTL, touch_live
 
 st.set_page_config(page_title="Jingle Palette", page_icon="🎛️", layout="wide")
 
 st.title("🎛️ Jingle Palette")
 st.caption("Lancez vos sons instantanément pendant vos enregistrements")
 
+# Mode live : tant que cette page est ouverte, les rendus ffmpeg (worker et Studio) sont bridés
+@st.fragment(run_every=LIVE_TTL / 3)
+def live_heartbeat():
+    touch_live()
+
+live_heartbeat()
+
 palette = JinglePalette()
 palette.render()
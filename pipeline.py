@@ -0,0 +1,182 @@
+import time
+
+# --- PIPELINE "PUBLIER L'ÉPISODE" ---
+# Un job 'publish_episode' est expansé par le worker en étapes reliées par depends_on :
+#
+#   upload_vodio ─────────────────────────────── (en parallèle dès le départ)
+#   generate_image ── generate_batch ─┬─ upload_youtube (une par vidéo)
+#                                     └─ upload_youtube (un par short)
+#
+# generate_batch rend vidéos et shorts en un seul passage ffmpeg (audio décodé une fois).
+# Avec batch_render=False, chaque vidéo / short est une étape generate_video /
+# generate_short distincte, parallélisable sur plusieurs slots du pool.
+
+PIPELINE_JOB_TYPE = "publish_episode"
+SHORTS_BATCH_JOB_TYPE = "generate_shorts"
+
+
+def _stage(parent, suffix, job_type, depends_on=None, inputs=None, **fields):
+    stage = {
+        "id": f"{parent['id']}-{suffix}",
+        "type": job_type,
+        "status": "pending",
+        "created_at": time.time(),
+        "progress": 0,
+        "parent_id": parent["id"],
+        "priority": parent.get("priority"),
+        "deadline": parent.get("deadline"),
+        "title": parent.get("title"),
+        "description": parent.get("description", ""),
+        "depends_on": depends_on or [],
+        # inputs : paramètre -> id de l'étape dont l'output_path sera injecté
+        # ("id#nom" : sortie nommée d'une étape qui en produit plusieurs)
+        "inputs": inputs or {},
+    }
+    stage.update(fields)
+    return stage
+
+
+def build_publish_stages(job):
+    """
+    Construit la liste des étapes d'un job publish_episode.
+    Champs attendus : audio_path, title, description, et optionnellement
+    image_options, video_formats, render_mode, bg_color, shorts [{start_time, duration}],
+    privacy, upload_vodio (bool), upload_youtube (bool), batch_render (bool, défaut True).
+    """
+    stages = []
+    upload_youtube = job.get("upload_youtube", True)
+    privacy = job.get("privacy", "private")
+
+    if job.get("upload_vodio", True):
+        stages.append(_stage(job, "vodio", "upload_vodio", audio_path=job["audio_path"]))
+
+    image = _stage(
+        job, "image", "generate_image",
+        ep_number=job.get("ep_number", ""),
+        image_options=job.get("image_options", {})
+    )
+    stages.append(image)
+
+    # Le mode static (basse fréquence d'images) ne se partage pas un passage à 25 fps
+    if job.get("batch_render", True) and job.get("render_mode") != "static":
+        stages += _batch_stages(job, image, upload_youtube, privacy)
+        return stages
+
+    for fmt in job.get("video_formats", ["square"]):
+        video = _stage(
+            job, f"video-{fmt}", "generate_video",
+            depends_on=[image["id"]], inputs={"image_path": image["id"]},
+            audio_path=job["audio_path"], format=fmt,
+            render_mode=job.get("render_mode", "balanced"),
+            bg_color=job.get("bg_color", "#000000")
+        )
+        stages.append(video)
+        if upload_youtube:
+            stages.append(_stage(
+                job, f"yt-{fmt}", "upload_youtube",
+                depends_on=[video["id"]], inputs={"file_path": video["id"]},
+                privacy=privacy
+            ))
+
+    for i, short in enumerate(job.get("shorts", [])):
+        short_stage = _stage(
+            job, f"short-{i}", "generate_short",
+            depends_on=[image["id"]], inputs={"image_path": image["id"]},
+            audio_path=job["audio_path"],
+            start_time=short.get("start_time", 0), duration=short.get("duration", 58),
+            render_mode=job.get("render_mode", "balanced"),
+            bg_color=job.get("bg_color", "#000000")
+        )
+        stages.append(short_stage)
+        if upload_youtube:
+            stages.append(_stage(
+                job, f"yt-short-{i}", "upload_youtube",
+                depends_on=[short_stage["id"]], inputs={"file_path": short_stage["id"]},
+                privacy=privacy, **_short_upload_fields(job)
+            ))
+
+    return stages
+
+
+def _short_upload_fields(job):
+    base_title = job.get("title", "")
+    return {
+        "title": f"{base_title} #Shorts",
+        "description": f"Extrait de l'épisode : {base_title}\n\nGénéré par Oppodcast #Shorts",
+    }
+
+
+def _batch_stages(job, image, upload_youtube, privacy):
+    """Une étape generate_batch pour toutes les vidéos et tous les shorts, puis les uploads"""
+    outputs = [{"name": f"video-{fmt}", "kind": "video", "format": fmt} for fmt in job.get("video_formats", ["square"])]
+    outputs += [
+        {"name": f"short-{i}", "kind": "short",
+         "start_time": short.get("start_time", 0), "duration": short.get("duration", 58)}
+        for i, short in enumerate(job.get("shorts", []))
+    ]
+    render = _stage(
+        job, "render", "generate_batch",
+        depends_on=[image["id"]], inputs={"image_path": image["id"]},
+        audio_path=job["audio_path"], outputs=outputs,
+        render_mode=job.get("render_mode", "balanced"),
+        bg_color=job.get("bg_color", "#000000")
+    )
+    stages = [render]
+    if not upload_youtube:
+        return stages
+
+    for out in outputs:
+        extra = _short_upload_fields(job) if out["kind"] == "short" else {}
+        suffix = f"yt-{out['format']}" if out["kind"] == "video" else f"yt-{out['name']}"
+        stages.append(_stage(
+            job, suffix, "upload_youtube",
+            depends_on=[render["id"]], inputs={"file_path": f"{render['id']}#{out['name']}"},
+            privacy=privacy, **extra
+        ))
+    return stages
+
+
+def resolve_inputs(job, store):
+    """Injecte dans le job les output_path des étapes amont déclarées dans inputs"""
+    for param, source_ref in job.get("inputs", {}).items():
+        source_id, _, output_name = source_ref.partition("#")
+        source = store.get_job(source_id)
+        path = (source or {}).get("outputs", {}).get(output_name) if output_name else (source or {}).get("output_path")
+        if not path:
+            raise ValueError(f"Sortie de l'étape {source_ref} introuvable pour '{param}'")
+        job[param] = path
+    return job
+
+
+def build_shorts_stages(job):
+    """
+    Étapes d'une série de shorts (job generate_shorts) : un generate_short par fenêtre
+    {start_time, duration, title}, tous recopiant l'audio encodé une fois en AAC (cache).
+    Le parallélisme est celui des slots de rendu du worker (OPPODCAST_TYPE_LIMITS pour le borner).
+    """
+    return [
+        _stage(
+            job, f"short-{i}", "generate_short",
+            audio_path=job["audio_path"], image_path=job["image_path"],
+            start_time=window.get("start_time", 0), duration=window.get("duration", 58),
+            title=window.get("title") or job.get("title"),
+            render_mode=job.get("render_mode", "balanced"),
+            bg_color=job.get("bg_color", "#000000")
+        )
+        for i, window in enumerate(job.get("windows", []))
+    ]
+
+
+def stage_outputs(store, parent_id):
+    """Fichiers produits par les étapes d'un job parent, dans l'ordre des étapes"""
+    # (longueur, id) : short-2 avant short-10
+    stages = sorted(store.list_jobs(parent_id=parent_id), key=lambda stage: (len(stage["id"]), stage["id"]))
+    return [stage["output_path"] for stage in stages if stage.get("output_path")]
+
+
+def pipeline_summary(store, parent_id):
+    """Avancement d'un pipeline : {statut: nombre d'étapes}"""
+    summary = {}
+    for stage in store.list_jobs(parent_id=parent_id):
+        summary[stage["status"]] = summary.get(stage["status"], 0) + 1
+    return summary
@@ -0,0 +1,86 @@
+import mmap
+import os
+import struct
+import time
+
+# --- CONFIGURATION ---
+# /dev/shm = RAM partagée entre le worker et Streamlit (même conteneur), sinon dossier local
+if os.path.isdir("/dev/shm"):
+    DEFAULT_PROGRESS_DIR = "/dev/shm/oppodcast-progress"
+else:
+    DEFAULT_PROGRESS_DIR = "progress"
+PROGRESS_DIR = os.environ.get("OPPODCAST_PROGRESS_DIR", DEFAULT_PROGRESS_DIR)
+
+# magic, seq, percent, fps, speed, eta, updated_at, stage (32 octets utf-8)
+RECORD = struct.Struct("<IIddddd32s")
+MAGIC = 0x4F505047  # "OPPG"
+
+
+def _record_path(job_id, progress_dir=PROGRESS_DIR):
+    return os.path.join(progress_dir, f"{job_id}.prog")
+
+
+class ProgressWriter:
+    """
+    Slot de progression d'un job : un petit enregistrement mmap de taille fixe,
+    réécrit en place (pas de fsync, pas de JSON). Protégé par un compteur
+    de séquence pour que le lecteur ne voie jamais un état à moitié écrit.
+    """
+
+    def __init__(self, job_id, progress_dir=PROGRESS_DIR):
+        os.makedirs(progress_dir, exist_ok=True)
+        self.path = _record_path(job_id, progress_dir)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, RECORD.size)
+            self._mm = mmap.mmap(fd, RECORD.size)
+        finally:
+            os.close(fd)
+        self._seq = 0
+        self._state = {"percent": 0.0, "fps": 0.0, "speed": 0.0, "eta": -1.0, "stage": ""}
+
+    def update(self, **fields):
+        """Ex: update(percent=42, fps=61.3, speed=2.4, eta=310, stage='encoding')"""
+        self._state.update({k: v for k, v in fields.items() if v is not None})
+        stage = str(self._state["stage"]).encode("utf-8")[:32]
+
+        # Seqlock : impair pendant l'écriture, pair une fois cohérent
+        self._seq += 1
+        struct.pack_into("<I", self._mm, 4, self._seq)
+        RECORD.pack_into(
+            self._mm, 0, MAGIC, self._seq,
+            float(self._state["percent"]), float(self._state["fps"]),
+            float(self._state["speed"]), float(self._state["eta"]),
+            time.time(), stage
+        )
+        self._seq += 1
+        struct.pack_into("<I", self._mm, 4, self._seq)
+
+    def close(self, remove=True):
+        self._mm.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def read_progress(job_id, progress_dir=PROGRESS_DIR, retries=5):
+    """Lecture sans verrou du slot d'un job. Renvoie None si le job n'écrit rien"""
+    path = _record_path(job_id, progress_dir)
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), RECORD.size, access=mmap.ACCESS_READ) as mm:
+                for _ in range(retries):
+                    magic, seq, percent, fps, speed, eta, updated_at, stage = RECORD.unpack_from(mm, 0)
+                    after = struct.unpack_from("<I", mm, 4)[0]
+                    if magic == MAGIC and seq % 2 == 0 and seq == after:
+                        return {
+                            "percent": percent, "fps": fps, "speed": speed,
+                            "eta": eta if eta >= 0 else None,
+                            "updated_at": updated_at,
+                            "stage": stage.rstrip(b"\0").decode("utf-8", "ignore"),
+                        }
+    except (OSError, ValueError):
+        pass
+    return None
@@ -0,0 +1,153 @@
+import hashlib
+import math
+import os
+
+# --- CACHE DES FONDS STATIQUES ---
+# Le fond flouté + la pochette centrée ne changent jamais pendant une vidéo :
+# on les calcule une seule fois (Pillow) au lieu de 25 fois par seconde dans ffmpeg.
+# Pillow n'est importé qu'au premier calcul : importer le worker ne le charge pas.
+CACHE_DIR = os.path.join("generated", ".cache", "composites")
+
+
+_DIGESTS = {}
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Empreinte SHA-1 du contenu d'un fichier (mémorisée tant que taille et mtime ne changent pas)"""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key in _DIGESTS:
+        return _DIGESTS[memo_key]
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    _DIGESTS[memo_key] = h.hexdigest()
+    return _DIGESTS[memo_key]
+
+
+def _cover(img, W, H):
+    """Équivalent de scale=W:H:force_original_aspect_ratio=increase,crop=W:H"""
+    from PIL import Image
+    ratio = max(W / img.width, H / img.height)
+    resized = img.resize((max(W, round(img.width * ratio)), max(H, round(img.height * ratio))), Image.Resampling.LANCZOS)
+    left = (resized.width - W) // 2
+    top = (resized.height - H) // 2
+    return resized.crop((left, top, left + W, top + H))
+
+
+def _darken(img, brightness):
+    """Équivalent approché de eq=brightness=-x (décalage de luminosité)"""
+    offset = int(round(-brightness * 255))
+    return img.point(lambda v: max(0, v - offset))
+
+
+def build_composite(image_path, W, H, fg_box, render_mode="balanced", bg_color="#000000",
+                    blur_sigma=20, brightness=-0.3):
+    """
+    Image finale statique (sans waveform).
+    fg_box : (largeur, hauteur) cible de la pochette (None = libre), ratio conservé, centrée.
+    render_mode 'turbo' : fond uni bg_color ; 'balanced' : fond flouté et assombri.
+    """
+    from PIL import Image, ImageFilter
+    src = Image.open(image_path).convert("RGB")
+
+    if render_mode == "turbo":
+        canvas = Image.new("RGB", (W, H), bg_color)
+    else:
+        canvas = _cover(src, W, H).filter(ImageFilter.GaussianBlur(radius=blur_sigma))
+        canvas = _darken(canvas, brightness)
+
+    fg = _fit(src, fg_box)
+    canvas.paste(fg, ((W - fg.width) // 2, (H - fg.height) // 2))
+    return canvas
+
+
+def _fit_size(width, height, fg_box):
+    """Taille de la pochette redimensionnée dans fg_box, ratio conservé"""
+    # None = dimension libre (comme le -1 des filtres scale de ffmpeg)
+    ratio = min(r for r in (
+        fg_box[0] / width if fg_box[0] else None,
+        fg_box[1] / height if fg_box[1] else None,
+    ) if r is not None)
+    return max(1, round(width * ratio)), max(1, round(height * ratio))
+
+
+def _fit(src, fg_box):
+    from PIL import Image
+    return src.resize(_fit_size(src.width, src.height, fg_box), Image.Resampling.LANCZOS)
+
+
+def prepare_static_composite(image_path, W, H, fg_box, render_mode="balanced", bg_color="#000000",
+                             blur_sigma=20, brightness=-0.3, cache_dir=CACHE_DIR):
+    """Renvoie le chemin du composite PNG, calculé au premier appel puis servi depuis le cache"""
+    key = hashlib.sha1(
+        f"{file_digest(image_path)}|{W}x{H}|{fg_box}|{render_mode}|{bg_color}|{blur_sigma}|{brightness}".encode()
+    ).hexdigest()
+    path = os.path.join(cache_dir, f"{key}.png")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    composite = build_composite(image_path, W, H, fg_box, render_mode, bg_color, blur_sigma, brightness)
+    temp_path = f"{path}.{os.getpid()}.tmp.png"
+    composite.save(temp_path)
+    os.replace(temp_path, path)
+    return path
+
+
+# --- FOND ANIMÉ (mode quality) ---
+# Le zoom lent (Ken Burns) ne demande pas d'agrandir la pochette à 8000 px ni de la flouter
+# à chaque image : le fond est flouté une fois, à la taille du zoom maximal, et ffmpeg n'a
+# plus qu'à recadrer/réduire cette image. Sur un fond aussi flou, arrondir le cadrage au
+# pixel près est invisible. Fond et pochette partagent une seule image (planche) pour que
+# les générateurs gardent une seule entrée image : fond en haut, pochette dessous.
+
+def still_loop(fps):
+    """
+    Tête de branche vidéo pour une entrée image fixe : l'image est décodée une seule fois
+    puis répétée dans le graphe (avec -loop 1, le PNG serait redécodé à chaque image).
+    """
+    return f"loop=loop=-1:size=1:start=0,fps={fps}"
+
+def motion_frames(zoom_step, zoom_max):
+    """Nombre d'images du mouvement : au-delà, le zoom est plafonné et le fond ne bouge plus"""
+    return math.ceil((zoom_max - 1) / zoom_step) + 1
+
+
+def build_motion_plate(image_path, W, H, fg_box, zoom_max=1.2, blur_sigma=30, brightness=-0.4):
+    """Planche : fond couvrant (W, H) x zoom_max, flouté et assombri, puis la pochette à sa taille finale"""
+    from PIL import Image, ImageFilter
+    src = Image.open(image_path).convert("RGB")
+    BW, BH = round(W * zoom_max), round(H * zoom_max)
+    background = _cover(src, BW, BH).filter(ImageFilter.GaussianBlur(radius=blur_sigma * zoom_max))
+    background = _darken(background, brightness)
+
+    fg = _fit(src, fg_box)
+    plate = Image.new("RGB", (max(BW, fg.width), BH + fg.height))
+    plate.paste(background, (0, 0))
+    plate.paste(fg, (0, BH))
+    return plate
+
+
+def prepare_motion_plate(image_path, W, H, fg_box, zoom_max=1.2, blur_sigma=30, brightness=-0.4, cache_dir=CACHE_DIR):
+    """
+    Renvoie (chemin de la planche, (largeur, hauteur) du fond, (largeur, hauteur) de la pochette).
+    Calculée au premier appel puis servie depuis le cache, comme les composites statiques.
+    """
+    key = hashlib.sha1(
+        f"plate|{file_digest(image_path)}|{W}x{H}|{fg_box}|{zoom_max}|{blur_sigma}|{brightness}".encode()
+    ).hexdigest()
+    path = os.path.join(cache_dir, f"{key}.png")
+    background_size = (round(W * zoom_max), round(H * zoom_max))
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        plate = build_motion_plate(image_path, W, H, fg_box, zoom_max, blur_sigma, brightness)
+        temp_path = f"{path}.{os.getpid()}.tmp.png"
+        plate.save(temp_path)
+        os.replace(temp_path, path)
+
+    # Taille de la pochette : en-tête de l'image source seulement (pas de décodage)
+    from PIL import Image
+    with Image.open(image_path) as src:
+        fg_size = _fit_size(src.width, src.height, fg_box)
+    return path, background_size, fg_size
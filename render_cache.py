@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+from render_assets import file_digest
+
+try:
+    import fcntl
+except ImportError:  # Windows : déduplication limitée au processus courant
+    fcntl = None
+
+# --- CONFIGURATION ---
+RENDER_CACHE_DIR = os.path.join("generated", ".cache", "renders")
+RENDER_CACHE_MAX_BYTES = int(float(os.environ.get("OPPODCAST_RENDER_CACHE_GB", "20")) * 1024 ** 3)
+# À incrémenter quand les graphes de filtres changent : invalide les anciens rendus
+RENDER_CACHE_VERSION = 1
+
+
+class RenderCache:
+    """
+    Cache de rendus adressé par contenu : clé = hash des fichiers d'entrée + paramètres.
+    - hit : le fichier existant est relié (hardlink) au chemin demandé, sans ré-encodage
+    - rendus identiques simultanés : le second attend le premier (verrou fichier, inter-processus)
+    - taille bornée : éviction LRU (mtime rafraîchi à chaque hit)
+    Les verrous (fichier <clé>.lock, verrou de thread) n'existent que le temps d'un rendu.
+    """
+
+    _thread_locks = {}  # clé -> [verrou, nombre de threads qui l'utilisent]
+    _thread_locks_guard = threading.Lock()
+
+    def __init__(self, cache_dir=RENDER_CACHE_DIR, max_bytes=RENDER_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, input_paths, **params):
+        h = hashlib.sha1(f"v{RENDER_CACHE_VERSION}".encode())
+        for path in input_paths:
+            h.update(file_digest(path).encode())
+        h.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def _entry_path(self, key, ext):
+        return os.path.join(self.cache_dir, f"{key}{ext}")
+
+    def _open_file_lock(self, path):
+        """flock exclusif sur path, en s'assurant que le fichier verrouillé est toujours celui du cache"""
+        while True:
+            lock_file = open(path, "w")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino:
+                    return lock_file
+            except FileNotFoundError:
+                pass
+            # Supprimé par son détenteur pendant l'attente : on reprend sur le nouveau fichier
+            lock_file.close()
+
+    @contextmanager
+    def _key_lock(self, key):
+        """Exclusion par clé : entre threads (verrou compté), puis entre processus (flock)"""
+        with self._thread_locks_guard:
+            entry = self._thread_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        try:
+            lock_file = self._open_file_lock(self._entry_path(key, ".lock")) if fcntl else None
+            try:
+                yield
+            finally:
+                if lock_file:
+                    # Supprimé avant d'être relâché : le rendu (réussi ou non) ne laisse pas de .lock
+                    try:
+                        os.remove(lock_file.name)
+                    except OSError:
+                        pass
+                    lock_file.close()
+        finally:
+            entry[0].release()
+            with self._thread_locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._thread_locks[key]
+
+    def get_or_render(self, key, output_path, render_fn):
+        """
+        render_fn() doit produire output_path et le renvoyer.
+        Renvoie (chemin, hit) où hit indique que le rendu a été servi par le cache.
+        """
+        ext = os.path.splitext(output_path)[1] or ".mp4"
+        entry = self._entry_path(key, ext)
+
+        with self._key_lock(key):
+            if os.path.exists(entry):
+                os.utime(entry)
+                self._publish(entry, output_path)
+                print(f"♻️ Rendu servi par le cache : {os.path.basename(output_path)}")
+                return output_path, True
+
+            # Les entrées du cache sont des hardlinks : on ne réécrit jamais un inode
+            # existant (ffmpeg -y tronquerait aussi l'entrée en cache)
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            result_path = render_fn()
+            self._store(result_path, entry)
+
+        self.evict()
+        return result_path, False
+
+    def lookup(self, key, output_path):
+        """Publie l'entrée en cache vers output_path si elle existe ; renvoie True si hit"""
+        entry = self._entry_path(key, os.path.splitext(output_path)[1] or ".mp4")
+        if not os.path.exists(entry):
+            return False
+        os.utime(entry)
+        self._publish(entry, output_path)
+        return True
+
+    def put(self, key, result_path):
+        """Enregistre un rendu produit hors de get_or_render (ex. rendu groupé)"""
+        self._store(result_path, self._entry_path(key, os.path.splitext(result_path)[1] or ".mp4"))
+
+    def _publish(self, entry, output_path):
+        if os.path.abspath(entry) == os.path.abspath(output_path):
+            return
+        if os.path.exists(output_path):
+            if os.path.samefile(entry, output_path):
+                return
+            os.remove(output_path)
+        try:
+            os.link(entry, output_path)
+        except OSError:
+            shutil.copyfile(entry, output_path)
+
+    def _store(self, result_path, entry):
+        temp_entry = f"{entry}.{os.getpid()}.tmp"
+        try:
+            os.link(result_path, temp_entry)
+        except OSError:
+            shutil.copyfile(result_path, temp_entry)
+        os.replace(temp_entry, entry)
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".lock"):
+                self._remove_stale_lock(os.path.join(self.cache_dir, name))
+                continue
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def _remove_stale_lock(self, path):
+        """.lock laissé par un processus tué en plein rendu : supprimé s'il n'est plus tenu"""
+        if not fcntl:
+            return
+        try:
+            with open(path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino:
+                    os.remove(path)
+        except OSError:
+            pass
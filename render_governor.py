@@ -0,0 +1,169 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+from progress_channel import PROGRESS_DIR
+
+# --- GOUVERNEUR DE RESSOURCES FFMPEG ---
+# Chaque ffmpeg est lancé avec une politique de ressources : cœurs autorisés (affinité,
+# d'où aussi le nombre de threads que ffmpeg/x264 en déduisent), priorité CPU (nice),
+# priorité disque (ionice) et, si un cgroup v2 délégué est fourni, un quota CPU.
+# Mode live : tant que la Jingle Palette est ouverte (battement de cœur dans un fichier),
+# les rendus en cours et à venir sont bridés pour ne pas dégrader l'émission en direct.
+FFMPEG_CPUS = int(os.environ.get("OPPODCAST_FFMPEG_CPUS", "0"))  # 0 = tous les cœurs
+FFMPEG_NICE = int(os.environ.get("OPPODCAST_FFMPEG_NICE", "10"))
+FFMPEG_IONICE = os.environ.get("OPPODCAST_FFMPEG_IONICE", "best-effort")  # best-effort | idle | none
+FFMPEG_CGROUP = os.environ.get("OPPODCAST_FFMPEG_CGROUP", "")  # dossier cgroup v2 inscriptible
+FFMPEG_CPU_QUOTA = float(os.environ.get("OPPODCAST_FFMPEG_CPU_QUOTA", "0"))  # en cœurs, 0 = sans quota
+
+LIVE_MODE = os.environ.get("OPPODCAST_LIVE_MODE", "auto")  # auto | on | off
+LIVE_FILE = os.environ.get("OPPODCAST_LIVE_FILE", os.path.join(PROGRESS_DIR, "live_mode"))
+LIVE_TTL = 30  # secondes sans battement avant de considérer la palette fermée
+LIVE_CPUS = int(os.environ.get("OPPODCAST_LIVE_CPUS", str(max(1, (os.cpu_count() or 1) // 4))))
+LIVE_NICE = 19
+LIVE_CPU_QUOTA = float(os.environ.get("OPPODCAST_LIVE_CPU_QUOTA", "0"))
+POLL_SECONDS = 2.0
+CGROUP_PERIOD_US = 100000
+IONICE_CLASSES = {"best-effort": ["-c", "2", "-n", "7"], "idle": ["-c", "3"]}
+
+
+# --- MODE LIVE ---
+def touch_live(path=LIVE_FILE):
+    """Battement de cœur de la palette : à appeler régulièrement tant qu'elle est ouverte"""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a"):
+            pass
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def is_live(path=LIVE_FILE):
+    if LIVE_MODE in ("on", "off"):
+        return LIVE_MODE == "on"
+    try:
+        return time.time() - os.path.getmtime(path) < LIVE_TTL
+    except OSError:
+        return False
+
+
+# --- POLITIQUE ---
+def _allowed_cpus(count):
+    """Les `count` derniers cœurs disponibles : le cœur 0 (UI, audio) reste le plus libre"""
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    if count <= 0 or count >= len(available):
+        return available
+    return available[-count:]
+
+
+def policy(live=None):
+    """Règles à appliquer maintenant : {cpus, nice, ionice, cpu_quota, live}"""
+    live = is_live() if live is None else live
+    if live:
+        cpus = _allowed_cpus(min(LIVE_CPUS, FFMPEG_CPUS) if FFMPEG_CPUS > 0 else LIVE_CPUS)
+        return {"cpus": cpus, "nice": max(LIVE_NICE, FFMPEG_NICE), "ionice": "idle",
+                "cpu_quota": LIVE_CPU_QUOTA or FFMPEG_CPU_QUOTA, "live": True}
+    return {"cpus": _allowed_cpus(FFMPEG_CPUS), "nice": FFMPEG_NICE, "ionice": FFMPEG_IONICE,
+            "cpu_quota": FFMPEG_CPU_QUOTA, "live": False}
+
+
+def cpu_budget(live=None):
+    """Nombre de cœurs qu'un rendu peut occuper (pour répartir les threads entre segments)"""
+    return len(policy(live)["cpus"])
+
+
+def governed_command(cmd, rules=None):
+    """
+    cmd (["ffmpeg", ...]) préfixé par nice/taskset/ionice (exec successifs : même pid que ffmpeg)
+    et avec les threads de filtres plafonnés au nombre de cœurs autorisés.
+    Les outils absents de la machine sont simplement ignorés.
+    """
+    rules = rules or policy()
+    threads = str(len(rules["cpus"]))
+    full_cmd = [cmd[0], "-filter_threads", threads, "-filter_complex_threads", threads, *cmd[1:]]
+
+    prefix = []
+    if rules["nice"] and shutil.which("nice"):
+        prefix += ["nice", "-n", str(rules["nice"])]
+    if len(rules["cpus"]) < len(_allowed_cpus(0)) and shutil.which("taskset"):
+        prefix += ["taskset", "-c", ",".join(str(c) for c in rules["cpus"])]
+    ionice_class = IONICE_CLASSES.get(rules["ionice"])
+    if ionice_class and shutil.which("ionice"):
+        # -t : si le conteneur refuse la priorité disque, ffmpeg est lancé quand même
+        prefix += ["ionice", "-t", *ionice_class]
+    return prefix + full_cmd
+
+
+def _set_cgroup_quota(quota):
+    if not FFMPEG_CGROUP:
+        return
+    value = f"{int(quota * CGROUP_PERIOD_US)} {CGROUP_PERIOD_US}" if quota > 0 else f"max {CGROUP_PERIOD_US}"
+    try:
+        with open(os.path.join(FFMPEG_CGROUP, "cpu.max"), "w") as f:
+            f.write(value)
+    except OSError as e:
+        print(f"⚠️ Quota CPU du cgroup impossible ({FFMPEG_CGROUP}) : {e}")
+
+
+def _apply(pid, rules):
+    """Applique les règles à un ffmpeg déjà lancé (tous ses threads)"""
+    try:
+        tids = [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+    except OSError:
+        tids = [pid]
+    for tid in tids:
+        try:
+            os.sched_setaffinity(tid, rules["cpus"])
+        except (OSError, AttributeError):
+            pass
+        try:
+            # Sans privilèges, on ne peut que baisser la priorité : le retour du mode normal garde le nice
+            if os.getpriority(os.PRIO_PROCESS, tid) < rules["nice"]:
+                os.setpriority(os.PRIO_PROCESS, tid, rules["nice"])
+        except OSError:
+            pass
+    ionice_class = IONICE_CLASSES.get(rules["ionice"])
+    if ionice_class and shutil.which("ionice"):
+        subprocess.run(["ionice", *ionice_class, "-p", *(str(tid) for tid in tids)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _set_cgroup_quota(rules["cpu_quota"])
+
+
+class RenderThrottle:
+    """Suit un ffmpeg en cours : rattachement au cgroup, puis bascule live/normal à chaud"""
+
+    def __init__(self, process, rules):
+        self.process = process
+        self.live = rules["live"]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def start(self):
+        if FFMPEG_CGROUP:
+            try:
+                with open(os.path.join(FFMPEG_CGROUP, "cgroup.procs"), "w") as f:
+                    f.write(str(self.process.pid))
+                _set_cgroup_quota(policy(self.live)["cpu_quota"])
+            except OSError as e:
+                print(f"⚠️ Rattachement au cgroup impossible ({FFMPEG_CGROUP}) : {e}")
+        if LIVE_MODE != "off":
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _watch(self):
+        while not self._stop.wait(POLL_SECONDS) and self.process.poll() is None:
+            live = is_live()
+            if live == self.live:
+                continue
+            self.live = live
+            rules = policy(live)
+            print(f"🎙️ Mode live {'activé' if live else 'terminé'} : ffmpeg {self.process.pid} sur {len(rules['cpus'])} cœur(s), nice {rules['nice']}")
+            _apply(self.process.pid, rules)
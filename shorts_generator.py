@@ -1,58 +1,135 @@
-import subprocess
 import os
-import re
+import math
+
+from render_assets import prepare_static_composite, prepare_motion_plate, motion_frames, still_loop
+from render_cache import RenderCache
+from ffmpeg_runner import run_ffmpeg
+
+# --- SÉRIES DE SHORTS ---
+# Audio partagé : l'épisode est encodé une fois en AAC (cache), chaque short y recopie
+# sa fenêtre (-c:a copy) au lieu de re-décoder le MP3 et de ré-encoder son extrait.
+# Une série est un job generate_shorts, expansé en un job generate_short par fenêtre.
+
+# Mode quality : zoom lent du fond, de 1 à ZOOM_MAX (40 s à 25 fps) puis fixe
+ZOOM_STEP = 0.0003
+ZOOM_MAX = 1.3
 
 class ShortsGenerator:
     def __init__(self, output_dir="generated"):
         self.output_dir = output_dir
+        # Statistiques ffmpeg du dernier encodage (out_time, wall...) ; None si servi par le cache
+        self.last_render = None
         os.makedirs(self.output_dir, exist_ok=True)
 
-    def generate_short(self, audio_path, image_path, start_time=0, duration=58, output_filename="short.mp4", progress_callback=None, render_mode="balanced", bg_color="#000000"):
+    def cache_key(self, cache, audio_path, image_path, start_time, duration, render_mode, bg_color, wave_engine="showwaves"):
+        params = dict(kind="short", start_time=float(start_time), duration=float(duration), render_mode=render_mode, bg_color=bg_color)
+        if wave_engine != "showwaves":
+            params["wave_engine"] = wave_engine
+        return cache.key_for([audio_path, image_path], **params)
+
+    def generate_short(self, audio_path, image_path, start_time=0, duration=58, output_filename="short.mp4", progress_callback=None, render_mode="balanced", bg_color="#000000", stats_callback=None, use_cache=True, wave_engine="showwaves"):
+        """
+        wave_engine: 'showwaves' (ffmpeg) ou 'numpy' (dessinée depuis l'enveloppe audio en cache)
+        L'audio est recopié depuis l'AAC de l'épisode en cache (voir prepare_episode)
+        """
         output_path = os.path.join(self.output_dir, output_filename)
-        print(f"📱 [Shorts {render_mode.upper()}] Génération PC : {output_filename}")
-        
+        self.last_render = None
+        render = lambda: self._render_short(audio_path, image_path, start_time, duration, output_path, progress_callback, render_mode, bg_color, stats_callback, wave_engine)
+        if not use_cache:
+            return render()
+
+        # Cache adressé par contenu : un short identique déjà rendu est réutilisé tel quel
+        cache = RenderCache(os.path.join(self.output_dir, ".cache", "renders"))
+        key = self.cache_key(cache, audio_path, image_path, start_time, duration, render_mode, bg_color, wave_engine)
+        output_path, hit = cache.get_or_render(key, output_path, render)
+        if hit and progress_callback: progress_callback(100)
+        return output_path
+
+    def prepare_episode(self, audio_path, image_path, render_mode="balanced", bg_color="#000000"):
+        """Travail commun à une série de shorts : fond composite (mis en cache) + audio encodé en AAC"""
+        from audio_analysis import ensure_aac
+        self._build_graph(image_path, 0, render_mode, bg_color)
+        return ensure_aac(audio_path, cache_dir=os.path.join(self.output_dir, ".cache", "aac"))
+
+    def _build_graph(self, image_path, duration, render_mode, bg_color, video_in=None, audio_in="[1:a]", tag="", wave_in=None):
+        """
+        Entrée image + filter_complex produisant [outv{tag}] (format vertical) à partir de
+        video_in (image) et audio_in (extrait audio déjà découpé).
+        Sans video_in, l'image est l'entrée 0, décodée une fois et répétée dans le graphe.
+        wave_in : flux vidéo RGBA de waveform déjà dessinée (moteur numpy) à la place de showwaves.
+        """
         # Format vertical strict pour Shorts/Reels/TikTok
         W, H = 1080, 1920
+        still = ""
+        if video_in is None:
+            still, video_in = f"[0:v]{still_loop(25)}[still{tag}];", f"[still{tag}]"
+
+        if wave_in:
+            wave_filter = f"{wave_in}format=rgba[wave{tag}];"
+        else:
+            wave_filter = f"{audio_in}showwaves=s={W}x350:mode=cline:colors=white@0.9:rate=25[wave{tag}];"
+        video_input = image_path
 
         # --- FOND ---
-        bg_filter = ""
-        fg_input = "[0:v]"
-        
-        if render_mode == "turbo":
-            # Fond couleur unie
-            bg_filter = f"color=c={bg_color}:s={W}x{H}:d={duration}[bg];"
-            fg_input = "[0:v]"
-            
-        elif render_mode == "balanced":
-            # Flou Gaussien Standard
-            bg_filter = (
-                f"[0:v]scale={W}:{H}:force_original_aspect_ratio=increase,crop={W}:{H},"
-                f"gblur=sigma=20:steps=2,eq=brightness=-0.4[bg];"
+        if render_mode in ("turbo", "balanced", "static"):
+            # Fond uni ou flou Gaussien standard + pochette : image statique précalculée
+            # une seule fois (Pillow, mise en cache), seule la waveform bouge.
+            # static (profil des vidéos longues) : les shorts gardent le rendu balanced
+            video_input = prepare_static_composite(
+                image_path, W, H, (W, None), render_mode="balanced" if render_mode == "static" else render_mode, bg_color=bg_color,
+                blur_sigma=20, brightness=-0.4, cache_dir=os.path.join(self.output_dir, ".cache", "composites")
+            )
+            filter_complex = (
+                still + wave_filter +
+                f"{video_in}[wave{tag}]overlay=x=0:y=H-450:format=auto[outv{tag}]"
             )
-            fg_input = "[0:v]"
             
         else: # quality
-            # Zoom lent vertical + Flou Gaussien plus fort
-            # On zoom légèrement (1.2x) pour donner du mouvement au fond statique
+            # Zoom lent (jusqu'à 1.3x) sur un fond flouté une seule fois (planche en cache) :
+            # par image, seulement un recadrage/réduction, puis plus rien une fois le zoom plafonné
+            video_input, (BW, BH), (fw, fh) = prepare_motion_plate(
+                image_path, W, H, (W, None), zoom_max=ZOOM_MAX, blur_sigma=30, brightness=-0.5,
+                cache_dir=os.path.join(self.output_dir, ".cache", "composites")
+            )
             bg_filter = (
-                f"[0:v]scale=-1:{int(H*1.2)},zoompan=z='min(zoom+0.0003,1.3)':d={duration*25}:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={W}x{H},"
-                f"gblur=sigma=30:steps=3,eq=brightness=-0.5[bg];"
+                f"{video_in}split=2[src{tag}][fgsrc{tag}];"
+                f"[src{tag}]crop={BW}:{BH}:0:0,"
+                f"zoompan=z='min(1+{ZOOM_STEP}*(on+1),{ZOOM_MAX})':d=1:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={W}x{H}:fps=25,"
+                f"trim=end_frame={motion_frames(ZOOM_STEP, ZOOM_MAX)},tpad=stop=-1:stop_mode=clone[bg{tag}];"
+            )
+
+            # --- FILTRE COMPLEXE ---
+            filter_complex = (
+                still + bg_filter +
+                f"[fgsrc{tag}]crop={fw}:{fh}:0:{BH}[fg{tag}];"
+                + wave_filter +
+                f"[bg{tag}][fg{tag}]overlay=(W-w)/2:(H-h)/2[comp{tag}];"
+                f"[comp{tag}][wave{tag}]overlay=x=0:y=H-450:format=auto[outv{tag}]"
             )
-            fg_input = "[0:v]"
+        return video_input, filter_complex
 
-        # --- FILTRE COMPLEXE ---
+    def _render_short(self, audio_path, image_path, start_time, duration, output_path, progress_callback, render_mode, bg_color, stats_callback, wave_engine="showwaves"):
+        output_filename = os.path.basename(output_path)
+        print(f"📱 [Shorts {render_mode.upper()}] Génération PC : {output_filename}")
+        waveform = None
+        if wave_engine == "numpy":
+            from waveform_engine import NumpyWaveform
+            waveform = NumpyWaveform.for_audio(
+                audio_path, 1080, 350, cache_root=os.path.join(self.output_dir, ".cache"), fps=25, alpha=0.9
+            )
         # Note: [1:a] est l'audio découpé par l'argument -ss/-t de l'input
-        filter_complex = (
-            bg_filter +
-            f"{fg_input}scale={W}:-1:force_original_aspect_ratio=decrease[fg];"
-            f"[1:a]showwaves=s={W}x350:mode=cline:colors=white@0.9:rate=25[wave];"
-            f"[bg][fg]overlay=(W-w)/2:(H-h)/2[comp1];"
-            f"[comp1][wave]overlay=x=0:y=H-450:format=auto[outv]"
-        )
+        video_input, filter_complex = self._build_graph(image_path, duration, render_mode, bg_color, wave_in="[2:v]" if waveform else None)
+
+        # Fenêtre lue dans l'AAC de l'épisode en cache (partagé par toute la série) : la recopie
+        # part du paquet AAC qui contient start_time, et ffmpeg écrit une liste d'édition MP4
+        # qui masque ce surplus à la lecture (coupe à l'échantillon près)
+        from audio_analysis import ensure_aac
+        audio_track = ensure_aac(audio_path, cache_dir=os.path.join(self.output_dir, ".cache", "aac"))
 
         cmd = [
-            "ffmpeg", "-y", "-loop", "1", "-i", image_path,
-            "-ss", str(start_time), "-t", str(duration), "-i", audio_path,
+            "ffmpeg", "-y", "-framerate", "25", "-i", video_input,
+            "-ss", str(start_time), "-t", str(duration), "-i", audio_track,
+            *(waveform.input_args() if waveform else []),
             "-filter_complex", filter_complex,
             "-map", "[outv]", "-map", "1:a",
             
@@ -62,7 +139,7 @@ class ShortsGenerator:
             "-crf", "23",          # Qualité constante
             "-tune", "stillimage",
             
-            "-c:a", "aac", "-b:a", "192k", # Audio propre
+            "-c:a", "copy", # AAC 192k du cache
             
             "-pix_fmt", "yuv420p",
             # Pas de restriction de threads sur PC
@@ -71,23 +148,16 @@ class ShortsGenerator:
             output_path
         ]
         
-        # Execution
-        print(f"Commande : {' '.join(cmd)}")
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-        pattern = re.compile(r"time=(\d{2}):(\d{2}):(\d{2}\.\d{2})")
-        
-        while True:
-            line = process.stderr.readline()
-            if not line and process.poll() is not None: break
-            if line:
-                print(line.strip())
-                if duration > 0 and progress_callback:
-                    match = pattern.search(line)
-                    if match:
-                        h, m, s = map(float, match.groups())
-                        curr = h*3600 + m*60 + s
-                        progress_callback(min(int((curr/duration)*100), 99))
-        
-        if process.returncode != 0: raise RuntimeError("FFmpeg Error")
+        def report(stats):
+            if duration <= 0:
+                return
+            if progress_callback: progress_callback(stats["percent"])
+            if stats_callback: stats_callback(stats)
+
+        writer = None
+        if waveform:
+            # Images de waveform envoyées sur pipe:0
+            writer = lambda stream: waveform.write_frames(stream, round(float(start_time) * 25), math.ceil(float(duration) * 25))
+        self.last_render = run_ffmpeg(cmd, duration=float(duration), on_progress=report, stdin_writer=writer, label=f"short:{render_mode}:{output_filename}")
         if progress_callback: progress_callback(100)
         return output_path
@@ -36,6 +36,17 @@ TRANS = {
         "btn_queue": "Mettre en file d'attente (Upload Vodio)",
         "success_queue": "Ajouté à la file de traitement",
         "err_title": "Le titre est obligatoire !",
+        "priority": "Priorité",
+        "prio_low": "Basse",
+        "prio_normal": "Normale",
+        "prio_high": "Haute",
+        "prio_urgent": "Urgente",
+        "set_deadline": "Fixer une échéance",
+        "publish_all": "Tout publier (Vodio + visuel + YouTube + Shorts)",
+        "pub_shorts": "Débuts des shorts (secondes ou mm:ss, séparés par des virgules)",
+        "err_shorts_times": "Débuts de shorts invalides (secondes ou mm:ss attendus)",
+        "btn_publish": "Lancer la publication complète",
+        "deadline": "Échéance",
 
         # --- SECTION 2 : INSTAGRAM ---
         "s2_title": "2. Studio Instagram",
@@ -73,9 +84,13 @@ TRANS = {
         "turbo_desc": "Turbo (Fond Uni) - Ultra Rapide",
         "balanced_desc": "Équilibré (Flou Standard) - Recommandé",
         "quality_desc": "Qualité (Flou + Zoom) - Plus Lent",
+        "static_desc": "Statique (Archives longues) - Le plus rapide et léger",
         "bg_color": "Couleur du fond",
         "warn_img": "⚠️ Générez d'abord une image Instagram ci-dessus (elle servira de base).",
         "btn_render_vid": "Lancer le rendu Vidéo",
+        "btn_preview_still": "👁️ Aperçu (image)",
+        "btn_preview_clip": "🎞️ Aperçu (5 s)",
+        "rendering_preview": "Rendu de l'aperçu...",
         "init_enc": "Initialisation de l'encodage...",
         "encoding": "Encodage en cours...",
         "success_render": "Vidéo générée avec succès !",
@@ -91,6 +106,15 @@ TRANS = {
         "info_source": "Source Audio :",
         "start_sec": "Début (secondes)",
         "dur_sec": "Durée (max 60s)",
+        "btn_highlights": "🔍 Suggérer des moments forts",
+        "analysing_highlights": "Analyse de l'épisode...",
+        "highlight_picks": "Moments forts détectés",
+        "batch_windows": "Série de shorts : une ligne par short (début, durée, titre)",
+        "btn_batch_shorts": "Générer la série (worker)",
+        "batch_queued": "shorts ajoutés à la file d'attente",
+        "err_batch_lines": "Lignes ignorées (début/durée invalides)",
+        "err_batch_empty": "Aucune fenêtre valide : rien n'a été mis en file",
+        "batch_status": "Série en cours",
         "render_mode_short": "Mode de Rendu Shorts",
         "bg_color_short": "Couleur de fond (Shorts)",
         "btn_gen_short": "Générer le Short",
@@ -105,6 +129,14 @@ TRANS = {
         # --- HISTORIQUE ---
         "hist_title": "5. Historique & File d'attente",
         "hist_none": "Aucun historique récent.",
+        "jobs_running": "Tâches en cours",
+        "queue_title": "File d'attente",
+        "queue_pos": "#",
+        "expected_start": "Démarrage estimé",
+        "queue_state": "État",
+        "queue_ready": "Prêt",
+        "queue_blocked_deps": "Attend une étape amont",
+        "queue_blocked_retry": "Nouvelle tentative différée",
         
         # --- WORKER NOTIFICATIONS ---
         "job_completed": "Tâche terminée",
@@ -141,6 +173,17 @@ TRANS = {
         "btn_queue": "Add to Queue (Vodio Upload)",
         "success_queue": "Added to processing queue",
         "err_title": "Title is required!",
+        "priority": "Priority",
+        "prio_low": "Low",
+        "prio_normal": "Normal",
+        "prio_high": "High",
+        "prio_urgent": "Urgent",
+        "set_deadline": "Set a deadline",
+        "publish_all": "Publish everywhere (Vodio + visual + YouTube + Shorts)",
+        "pub_shorts": "Shorts start times (seconds or mm:ss, comma-separated)",
+        "err_shorts_times": "Invalid shorts start times (seconds or mm:ss expected)",
+        "btn_publish": "Start full publication",
+        "deadline": "Deadline",
         "s2_title": "2. Instagram Studio",
         "mod_missing": "Module missing or not loaded.",
         "custom": "Customization",
@@ -174,9 +217,13 @@ TRANS = {
         "turbo_desc": "Turbo (Solid Color) - Ultra Fast",
         "balanced_desc": "Balanced (Standard Blur) - Recommended",
         "quality_desc": "Quality (Blur + Zoom) - Slower",
+        "static_desc": "Static (Long archives) - Fastest and smallest",
         "bg_color": "Background Color",
         "warn_img": "⚠️ Generate an Instagram image first (used as base).",
         "btn_render_vid": "Start Video Render",
+        "btn_preview_still": "👁️ Preview (frame)",
+        "btn_preview_clip": "🎞️ Preview (5 s)",
+        "rendering_preview": "Rendering preview...",
         "init_enc": "Initializing encoding...",
         "encoding": "Encoding...",
         "success_render": "Video generated successfully!",
@@ -190,6 +237,15 @@ TRANS = {
         "info_source": "Audio Source:",
         "start_sec": "Start (seconds)",
         "dur_sec": "Duration (max 60s)",
+        "btn_highlights": "🔍 Suggest highlights",
+        "analysing_highlights": "Analysing episode...",
+        "highlight_picks": "Detected highlights",
+        "batch_windows": "Shorts series: one line per short (start, duration, title)",
+        "btn_batch_shorts": "Generate series (worker)",
+        "batch_queued": "shorts added to the queue",
+        "err_batch_lines": "Lines skipped (invalid start/duration)",
+        "err_batch_empty": "No valid window: nothing was queued",
+        "batch_status": "Series in progress",
         "render_mode_short": "Shorts Render Mode",
         "bg_color_short": "Background Color (Shorts)",
         "btn_gen_short": "Generate Short",
@@ -202,6 +258,14 @@ TRANS = {
         "config_gen_first": "Generate a short to preview it.",
         "hist_title": "5. History & Queue",
         "hist_none": "No recent history.",
+        "jobs_running": "Running jobs",
+        "queue_title": "Queue",
+        "queue_pos": "#",
+        "expected_start": "Expected start",
+        "queue_state": "State",
+        "queue_ready": "Ready",
+        "queue_blocked_deps": "Waiting for an upstream stage",
+        "queue_blocked_retry": "Retry delayed",
         "job_completed": "Job Completed",
         "job_failed": "Job Failed"
     }
@@ -1,7 +1,6 @@
 ﻿import time
 import os
 import logging
-from playwright.sync_api import sync_playwright
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -21,6 +20,9 @@ class VodioUploader:
         PODCAST_NAME = "Test"  # TODO: Change this to your actual podcast name on Vodio
         
         logging.info(f"[Vodio] Starting session for {login}...")
+
+        # Lazy import: Playwright is only loaded when an upload actually runs
+        from playwright.sync_api import sync_playwright
         
         with sync_playwright() as p:
             browser = p.chromium.launch(
@@ -0,0 +1,79 @@
+import numpy as np
+
+from audio_analysis import CACHE_ROOT, ENVELOPE_RATE, load_envelope
+
+# --- MOTEUR DE WAVEFORM NUMPY ---
+# Alternative à showwaves : les images de la waveform sont dessinées à partir de
+# l'enveloppe en cache (aucun décodage audio) et envoyées brutes (RGBA) à ffmpeg,
+# qui les superpose au fond comme la sortie de showwaves.
+WAVE_ENGINES = ("showwaves", "numpy")
+
+
+class NumpyWaveform:
+    """
+    Waveform symétrique centrée sur l'instant courant : une fenêtre glissante de
+    window_seconds d'enveloppe répartie sur la largeur (crête en halo, RMS en cœur plein).
+    """
+
+    def __init__(self, envelope, width, height, fps=25, window_seconds=3.0, color=(255, 255, 255), alpha=0.8):
+        self.envelope = envelope
+        self.width, self.height, self.fps = width, height, fps
+        # Normalisation sur le 99e centile des crêtes : un épisode calme remplit aussi la bande
+        peaks = envelope[:, 0].astype(np.float32) if len(envelope) else np.zeros(1, dtype=np.float32)
+        self.gain = 1.0 / max(float(np.percentile(peaks, 99)), 1e-3)
+
+        points = int(window_seconds * ENVELOPE_RATE)
+        self.offsets = (np.arange(width) * points // width - points // 2).astype(np.int64)
+        half = height / 2.0
+        self.distance = np.abs(np.arange(height, dtype=np.float32) + 0.5 - half)[:, None] / half
+        # Halo (crête) puis cœur (RMS <= crête) : deux masques cumulés en uint8
+        self.edge_alpha = np.uint8(255 * alpha * 0.5)
+        self.core_extra = np.uint8(255 * alpha - int(self.edge_alpha))
+        self.color = color
+
+    def new_buffer(self):
+        """Tampon RGBA réutilisé d'une image à l'autre (un par flux : les segments tournent en parallèle)"""
+        buffer = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        buffer[:, :, :3] = self.color
+        return buffer
+
+    @classmethod
+    def for_audio(cls, audio_path, width, height, cache_root=CACHE_ROOT, **kwargs):
+        return cls(load_envelope(audio_path, cache_root), width, height, **kwargs)
+
+    def frame(self, index, buffer=None):
+        """Image RGBA (octets bruts) de la waveform pour l'image `index` de la vidéo"""
+        buffer = self.new_buffer() if buffer is None else buffer
+        center = int(index * ENVELOPE_RATE / self.fps)
+        idx = center + self.offsets
+        valid = (idx >= 0) & (idx < len(self.envelope))
+        values = np.zeros((self.width, 2), dtype=np.float32)
+        values[valid] = self.envelope[idx[valid]]
+        values = np.minimum(values * self.gain, 1.0)
+
+        peak, rms = values[:, 0][None, :], values[:, 1][None, :]
+        alpha = (self.distance <= peak).view(np.uint8) * self.edge_alpha
+        alpha += (self.distance <= rms).view(np.uint8) * self.core_extra
+        buffer[:, :, 3] = alpha
+        return buffer.tobytes()
+
+    def write_frames(self, stream, start_frame, count):
+        """Écrit `count` images à partir de start_frame dans stream (stdin de ffmpeg)"""
+        buffer = self.new_buffer()
+        try:
+            for index in range(start_frame, start_frame + count):
+                stream.write(self.frame(index, buffer))
+        except BrokenPipeError:
+            pass  # ffmpeg a terminé (ou échoué) : son code retour fait foi
+        finally:
+            try:
+                stream.close()
+            except BrokenPipeError:
+                pass
+
+    def input_args(self, fps=None):
+        """Arguments ffmpeg de l'entrée brute lue sur stdin"""
+        return [
+            "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{self.width}x{self.height}",
+            "-r", str(fps or self.fps), "-i", "pipe:0",
+        ]
@@ -1,71 +1,230 @@
 ﻿import time
 import json
 import os
+import socket
+import uuid
 import traceback
 import sys
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-# --- CONFIGURATION ---
-JOBS_FILE = "jobs.json"
-try:
-    from youtube_generator import YouTubeGenerator
-    from vodio_uploader import VodioUploader
-    from shorts_generator import ShortsGenerator 
-except ImportError as e:
-    print(f"⚠️ Erreur d'import dans le Worker : {e}")
-
-def load_jobs():
-    if not os.path.exists(JOBS_FILE):
-        return {}
-    try:
-        with open(JOBS_FILE, "r") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        return {}
-
-def save_jobs(jobs):
-    """Sauvegarde atomique pour éviter la corruption de fichier"""
-    temp_file = f"{JOBS_FILE}.tmp"
-    with open(temp_file, "w") as f:
-        json.dump(jobs, f, indent=4)
-    os.replace(temp_file, JOBS_FILE)
-
-def update_job_status(job_id, status, error_msg=None, progress=0):
-    """Met à jour le statut d'un job pour l'UI"""
-    jobs = load_jobs()
-    if job_id in jobs:
-        jobs[job_id]["status"] = status
-        jobs[job_id]["progress"] = progress
-        if error_msg:
-            jobs[job_id]["error"] = error_msg
-        
-        if status in ["completed", "failed"]:
-            jobs[job_id]["finished_at"] = time.time()
-            
-        save_jobs(jobs)
+from job_store import get_job_store, notify_workers, JobWakeup, LEASE_SECONDS
+from ffmpeg_runner import FFmpegError, abort_renders, reset_abort
+from progress_channel import ProgressWriter
+from pipeline import PIPELINE_JOB_TYPE, SHORTS_BATCH_JOB_TYPE, build_publish_stages, build_shorts_stages, resolve_inputs
+import metrics
+
+# Imports légers : Playwright, le client Google et Pillow ne sont chargés
+# qu'à l'exécution du premier job qui en a besoin
+from youtube_generator import YouTubeGenerator
+from vodio_uploader import VodioUploader
+from shorts_generator import ShortsGenerator
+from batch_renderer import BatchRenderer
+from youtube_uploader import YouTubeUploader
+
+def _insta_generator():
+    from insta_generator import InstaGenerator
+    return InstaGenerator()
+
+# Identifiant unique de ce worker (plusieurs workers d'un même hôte peuvent partager la file ;
+# la base SQLite en WAL ne se partage pas entre hôtes, ni sur un système de fichiers réseau)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class LeaseLost(RuntimeError):
+    """Le job a été repris par un autre worker : ses résultats ne doivent plus être écrits"""
+
+
+def update_job_status(job_id, status, error_msg=None, progress=0, owner=None):
+    """
+    Met à jour le statut d'un job pour l'UI (une seule ligne en base).
+    Avec owner, l'écriture n'a lieu que si ce worker détient encore le bail (renvoie False sinon).
+    """
+    fields = {"status": status, "progress": progress}
+    if error_msg:
+        fields["error"] = error_msg
+    if status in ["completed", "failed"]:
+        fields["finished_at"] = time.time()
+        fields["lease_owner"] = None
+        fields["lease_expires_at"] = None
+    if owner is not None:
+        return get_job_store().update_owned_job(job_id, owner, **fields)
+    return get_job_store().update_job(job_id, **fields)
+
+
+def save_job_result(job_id, owner, **fields):
+    """Enregistre le résultat d'un job, seulement s'il est toujours sous notre bail"""
+    if not get_job_store().update_owned_job(job_id, owner, **fields):
+        raise LeaseLost(f"Bail perdu pour le job {job_id} : résultat non enregistré")
+
+
+class LeaseHeartbeat:
+    """
+    Renouvelle le bail d'un job en arrière-plan tant que le slot travaille dessus.
+    Si le bail est perdu, on_lost() est appelé (arrêt des rendus) et check() lève LeaseLost.
+    """
+
+    def __init__(self, job_id, owner, lease_seconds=LEASE_SECONDS, on_lost=None):
+        self.job_id = job_id
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.on_lost = on_lost
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{job_id}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not get_job_store().heartbeat(self.job_id, self.owner, self.lease_seconds):
+                    print(f"⚠️ Bail perdu pour le job {self.job_id} : il a été repris ailleurs, abandon")
+                    self.lost.set()
+                    if self.on_lost:
+                        self.on_lost()
+                    return
+            except Exception as e:
+                print(f"⚠️ Heartbeat impossible pour le job {self.job_id} : {e}")
+
+    def check(self):
+        """À appeler avant une étape irréversible (upload)"""
+        if self.lost.is_set():
+            raise LeaseLost(f"Bail perdu pour le job {self.job_id} : étape annulée")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
 
-def process_video_generation(job, job_id):
+def _render_report(kind, job, format, stats):
+    """
+    Mesures du dernier encodage pour RENDER_REALTIME : temps média et temps ffmpeg
+    (hors préparation AAC / fonds). None si le rendu a été servi par le cache.
+    """
+    if not stats or not stats.get("out_time") or not stats.get("wall"):
+        return None
+    return {
+        "kind": kind, "render_mode": job.get("render_mode", "balanced"), "format": format,
+        "media_seconds": stats["out_time"], "wall": stats["wall"]
+    }
+
+def process_video_generation(job, job_id, report=None):
     """Logique dédiée à la génération vidéo"""
     gen = YouTubeGenerator()
     
-    # Callback pour mettre à jour la progress bar dans l'UI via le JSON
-    def progress_callback(p):
-        if p % 10 == 0:
-            update_job_status(job_id, "processing", progress=p)
-
-    output_path = gen.generate_video(
-        audio_path=job["audio_path"],
-        image_path=job["image_path"],
-        output_filename=f"video_{job_id}.mp4",
-        render_mode=job.get("render_mode", "balanced"), # Important : paramètre par défaut
-        progress_callback=progress_callback
+    # Progression fine via le slot mmap (aucune écriture en base pendant le rendu)
+    progress = ProgressWriter(job_id)
+    progress.update(percent=0, stage="encoding")
+
+    try:
+        output_path = gen.generate_video(
+            audio_path=job["audio_path"],
+            image_path=job["image_path"],
+            output_filename=f"video_{job_id}.mp4",
+            format=job.get("format", "square"),
+            render_mode=job.get("render_mode", "balanced"), # Important : paramètre par défaut
+            bg_color=job.get("bg_color", "#000000"),
+            stats_callback=lambda stats: progress.update(**stats),
+            segments=job.get("segments"),
+            wave_engine=job.get("wave_engine", "showwaves")
+        )
+    finally:
+        progress.close()
+    if report is not None:
+        report["render"] = _render_report("video", job, job.get("format", "square"), gen.last_render)
+    return output_path
+
+def process_short_generation(job, job_id, report=None):
+    """Génération d'un short vertical (étape de pipeline)"""
+    gen = ShortsGenerator()
+    progress = ProgressWriter(job_id)
+    progress.update(percent=0, stage="encoding")
+
+    try:
+        output_path = gen.generate_short(
+            audio_path=job["audio_path"],
+            image_path=job["image_path"],
+            start_time=job.get("start_time", 0),
+            duration=job.get("duration", 58),
+            output_filename=f"short_{job_id}.mp4",
+            render_mode=job.get("render_mode", "balanced"),
+            bg_color=job.get("bg_color", "#000000"),
+            stats_callback=lambda stats: progress.update(**stats),
+            wave_engine=job.get("wave_engine", "showwaves")
+        )
+    finally:
+        progress.close()
+    if report is not None:
+        report["render"] = _render_report("short", job, "short", gen.last_render)
+    return output_path
+
+def process_batch_generation(job, job_id, report=None):
+    """Tous les livrables vidéo d'un épisode en un seul passage ffmpeg (étape de pipeline)"""
+    progress = ProgressWriter(job_id)
+    progress.update(percent=0, stage="encoding")
+
+    outputs = [dict(out, output_filename=f"{out['name']}_{job_id}.mp4") for out in job["outputs"]]
+    renderer = BatchRenderer()
+    try:
+        paths = renderer.render_batch(
+            audio_path=job["audio_path"],
+            image_path=job["image_path"],
+            outputs=outputs,
+            render_mode=job.get("render_mode", "balanced"),
+            bg_color=job.get("bg_color", "#000000"),
+            stats_callback=lambda stats: progress.update(**stats)
+        )
+    finally:
+        progress.close()
+    if report is not None:
+        report["render"] = _render_report("batch", job, "batch", renderer.last_render)
+    return {out["name"]: path for out, path in zip(outputs, paths)}
+
+def process_shorts_batch(job, job_id):
+    """Série de shorts : prépare fond et audio une fois, puis un job generate_short par fenêtre"""
+    ShortsGenerator().prepare_episode(
+        job["audio_path"], job["image_path"],
+        render_mode=job.get("render_mode", "balanced"), bg_color=job.get("bg_color", "#000000")
+    )
+    stages = build_shorts_stages(job)
+    get_job_store().add_jobs(stages)
+    print(f"📱 Série {job_id} : {len(stages)} short(s) en file")
+    return [stage["id"] for stage in stages]
+
+def process_image_generation(job, job_id):
+    """Visuel de l'épisode, partagé ensuite par la vidéo et les shorts"""
+    os.makedirs("generated", exist_ok=True)
+    output_path = os.path.join("generated", f"insta_{job_id}.png")
+    _insta_generator().generate_post(
+        title=job.get("title", ""),
+        ep_number=job.get("ep_number", ""),
+        output_path=output_path,
+        **job.get("image_options", {})
     )
     return output_path
 
+def process_youtube_upload(job, job_id):
+    """Upload YouTube d'une vidéo ou d'un short produit par une étape amont"""
+    return YouTubeUploader().upload_video(
+        job["file_path"], job.get("title", ""), job.get("description", ""),
+        privacy=job.get("privacy", "private")
+    )
+
+def process_publish_episode(job, job_id):
+    """Expanse le pipeline en étapes dépendantes ; le worker les exécute au fil de l'eau"""
+    stages = build_publish_stages(job)
+    get_job_store().add_jobs(stages)
+    print(f"🧩 Pipeline {job_id} : {len(stages)} étape(s) en file")
+    return [stage["id"] for stage in stages]
+
 def process_upload(job, job_id):
     """Logique d'upload"""
 
-    secrets = load_jobs().get("secrets", {})
-    
     if os.path.exists("secrets.json"):
         with open("secrets.json", "r") as f:
             secrets = json.load(f)
@@ -89,50 +248,222 @@ def process_upload(job, job_id):
     return True
 
 
-def main():
-    print("🚀 Oppodcast Worker Démarré (Mode Local)...")
+def _upload_report(target, file_path, started):
+    try:
+        size = os.path.getsize(file_path)
+    except OSError:
+        size = 0
+    return {"target": target, "bytes": size, "seconds": time.time() - started}
+
+# Seuls les rendus sont rejoués après une erreur passagère (ffmpeg tué, mémoire) ; les uploads
+# ne sont pas idempotents et les erreurs d'entrée (type inconnu, secrets.json...) sont définitives.
+# Un bail expiré (worker mort) est toujours repris, voir reclaim_expired().
+RENDER_JOB_TYPES = ["generate_video", "generate_short", "generate_batch", SHORTS_BATCH_JOB_TYPE, "generate_image"]
+TRANSIENT_ERRORS = (FFmpegError, MemoryError)
+
+def is_retryable(job, error):
+    return job["type"] in RENDER_JOB_TYPES and isinstance(error, TRANSIENT_ERRORS)
+
+def run_job(job):
+    """
+    Exécute un job déjà réservé (appelé en série ou depuis un slot du pool).
+    Renvoie un rapport picklable pour les métriques du processus principal.
+    """
+    job_id = job["id"]
+    owner = job.get("lease_owner")
+    started = time.time()
+    report = {"type": job["type"], "wait": started - (job.get("created_at") or started)}
+    print(f"🔧 Traitement du job : {job_id} ({job['type']}, tentative {job.get('attempts', 1)})")
     
-    while True:
-        jobs = load_jobs()
+    try:
+        # Bail perdu : les ffmpeg du job sont tués et les uploads pas encore lancés sont annulés
+        reset_abort()
+        with LeaseHeartbeat(job_id, owner, on_lost=abort_renders) as lease:
+            # Étape de pipeline : récupère les fichiers produits par les étapes amont
+            resolve_inputs(job, get_job_store())
 
-        pending_job_id = None
-        for jid, data in jobs.items():
-            if data["status"] == "pending":
-                pending_job_id = jid
-                break
-        
-        if pending_job_id:
-            job = jobs[pending_job_id]
-            print(f"🔧 Traitement du job : {pending_job_id} ({job['type']})")
+            if job["type"] == "generate_video":
+                result_path = process_video_generation(job, job_id, report)
+                save_job_result(job_id, owner, video_path=result_path, output_path=result_path)
+                
+            elif job["type"] == "generate_short":
+                result_path = process_short_generation(job, job_id, report)
+                save_job_result(job_id, owner, output_path=result_path)
+
+            elif job["type"] == "generate_batch":
+                outputs = process_batch_generation(job, job_id, report)
+                save_job_result(job_id, owner, outputs=outputs)
+
+            elif job["type"] == SHORTS_BATCH_JOB_TYPE:
+                stage_ids = process_shorts_batch(job, job_id)
+                save_job_result(job_id, owner, stage_ids=stage_ids)
+
+            elif job["type"] == "generate_image":
+                result_path = process_image_generation(job, job_id)
+                save_job_result(job_id, owner, output_path=result_path)
+
+            elif job["type"] == "upload_vodio":
+                lease.check()
+                upload_started = time.time()
+                process_upload(job, job_id)
+                report["upload"] = _upload_report("vodio", job["audio_path"], upload_started)
             
-            update_job_status(pending_job_id, "processing", progress=0)
+            elif job["type"] == "upload_youtube":
+                lease.check()
+                upload_started = time.time()
+                link = process_youtube_upload(job, job_id)
+                report["upload"] = _upload_report("youtube", job["file_path"], upload_started)
+                save_job_result(job_id, owner, link=link)
+
+            elif job["type"] == PIPELINE_JOB_TYPE:
+                stage_ids = process_publish_episode(job, job_id)
+                save_job_result(job_id, owner, stage_ids=stage_ids)
             
-            try:
-                if job["type"] == "generate_video":
-                    result_path = process_video_generation(job, pending_job_id)
-                    jobs = load_jobs()
-                    jobs[pending_job_id]["video_path"] = result_path
-                    jobs[pending_job_id]["status"] = "completed"
-                    jobs[pending_job_id]["progress"] = 100
-                    save_jobs(jobs)
-                    
-                elif job["type"] == "upload_vodio":
-                    process_upload(job, pending_job_id)
-                    update_job_status(pending_job_id, "completed", progress=100)
-                
-                else:
-                    raise ValueError(f"Type de job inconnu : {job['type']}")
+            else:
+                raise ValueError(f"Type de job inconnu : {job['type']}")
 
-                print(f"✅ Job {pending_job_id} terminé avec succès.")
+        # Écriture conditionnée au bail : un worker dépassé ne marque pas le job terminé
+        if not update_job_status(job_id, "completed", progress=100, owner=owner):
+            raise LeaseLost(f"Bail perdu pour le job {job_id} : fin non enregistrée")
+        report["outcome"] = "completed"
+        print(f"✅ Job {job_id} terminé avec succès.")
 
-            except Exception as e:
-                error_trace = traceback.format_exc()
-                print(f"❌ Erreur sur le job {pending_job_id} : {e}")
-                print(error_trace)
-                update_job_status(pending_job_id, "failed", error_msg=str(e))
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        print(f"❌ Erreur sur le job {job_id} : {e}")
+        print(error_trace)
+        # Nouvelle tentative avec backoff exponentiel (rendus, erreurs passagères), sinon échec
+        status = get_job_store().retry_or_fail(job_id, str(e), owner=owner, retry=is_retryable(job, e))
+        report["outcome"] = {"pending": "retry", None: "lease_lost"}.get(status, "failed")
+        if status == "pending":
+            print(f"🔁 Job {job_id} remis en file (nouvelle tentative différée)")
+        elif status is None:
+            print(f"♻️ Job {job_id} abandonné : un autre worker en a repris le bail")
+
+    report["run"] = time.time() - started
+    return report
+
+
+# --- COMPACTION EN TÂCHE DE FOND ---
+COMPACT_INTERVAL = float(os.environ.get("OPPODCAST_COMPACT_INTERVAL", "3600"))
+
+def compaction_loop():
+    """Archive périodiquement les vieux jobs pour garder la table chaude petite"""
+    while True:
+        try:
+            get_job_store().compact()
+        except Exception as e:
+            print(f"⚠️ Erreur de compaction : {e}")
+        time.sleep(COMPACT_INTERVAL)
+
+def start_compaction():
+    threading.Thread(target=compaction_loop, name="compaction", daemon=True).start()
+
+
+def main():
+    print("🚀 Oppodcast Worker Démarré (Mode Local)...")
+    store = get_job_store()
+    start_compaction()
+    metrics.start_metrics_server(get_job_store)
+    wakeup = JobWakeup()
+    
+    while True:
+        job = store.claim_next_pending(owner=WORKER_ID)
         
+        if job:
+            metrics.record_job(run_job(job))
         else:
-            time.sleep(2)
+            wakeup.wait(store.next_wakeup_delay())
+
+
+# --- MODE POOL : voies CPU (process) et I/O (threads) séparées ---
+RENDER_SLOTS = int(os.environ.get("OPPODCAST_RENDER_SLOTS", "2"))
+UPLOAD_SLOTS = int(os.environ.get("OPPODCAST_UPLOAD_SLOTS", "4"))
+
+LANES = {
+    "render": {"types": RENDER_JOB_TYPES, "slots": RENDER_SLOTS, "executor": "process"},
+    "io": {"types": ["upload_vodio", "upload_youtube", PIPELINE_JOB_TYPE], "slots": UPLOAD_SLOTS, "executor": "thread"},
+}
+
+def parse_type_limits(raw):
+    """'generate_video=2,upload_vodio=3' -> {'generate_video': 2, 'upload_vodio': 3}"""
+    limits = {}
+    for item in raw.split(","):
+        if "=" in item:
+            job_type, value = item.split("=", 1)
+            limits[job_type.strip()] = int(value)
+    return limits
+
+TYPE_LIMITS = parse_type_limits(os.environ.get("OPPODCAST_TYPE_LIMITS", ""))
+
+def pool_mode():
+    return "--pool" in sys.argv or os.environ.get("OPPODCAST_WORKER_MODE") == "pool"
+
+def queue_lanes(pool=False):
+    """Voies du worker pour estimate_start_times : un seul slot global en mode série"""
+    if not pool:
+        return [{"types": None, "slots": 1}]
+    return [{"types": lane["types"], "slots": lane["slots"], "limits": TYPE_LIMITS} for lane in LANES.values()]
+
+def _on_slot_done(fut):
+    # Les rapports des slots (même ceux du pool de processus) sont agrégés ici
+    if not fut.cancelled() and fut.exception() is None:
+        metrics.record_job(fut.result())
+    notify_workers()
+
+def _new_executor(lane):
+    if lane["executor"] == "process":
+        # forkserver : les processus de rendu ne sont pas forkés depuis un parent qui a déjà des
+        # threads (métriques, compaction, uploads, heartbeats) et peut-être un verrou tenu
+        return ProcessPoolExecutor(max_workers=lane["slots"], mp_context=multiprocessing.get_context("forkserver"))
+    return ThreadPoolExecutor(max_workers=lane["slots"])
+
+def main_pool():
+    print(f"🚀 Oppodcast Worker Démarré (Mode Pool : {RENDER_SLOTS} rendu(s), {UPLOAD_SLOTS} upload(s))...")
+    store = get_job_store()
+    executors = {name: _new_executor(lane) for name, lane in LANES.items()}
+    running = {name: {} for name in LANES}  # future -> job
+    wakeup = JobWakeup()
+    start_compaction()
+    metrics.start_metrics_server(get_job_store)
+    
+    while True:
+        # 1. Libère les slots terminés. Un processus de rendu mort (OOM, segfault) casse
+        #    tout son pool : ses jobs en vol n'ont rien enregistré, ils repartent en file
+        for futures in running.values():
+            for fut in [f for f in futures if f.done()]:
+                job = futures.pop(fut)
+                if not fut.cancelled() and isinstance(fut.exception(), BrokenProcessPool):
+                    print(f"💥 Slot de rendu perdu pendant le job {job['id']}, remise en file")
+                    store.retry_or_fail(job["id"], "Processus de rendu interrompu", owner=WORKER_ID)
+        
+        # 2. Remplit chaque voie dans la limite de ses slots et des limites par type
+        for name, lane in LANES.items():
+            while len(running[name]) < lane["slots"]:
+                busy = Counter(job["type"] for job in running[name].values())
+                allowed = [jt for jt in lane["types"] if busy[jt] < TYPE_LIMITS.get(jt, lane["slots"])]
+                if not allowed:
+                    break
+                job = store.claim_next_pending(job_types=allowed, owner=WORKER_ID)
+                if not job:
+                    break
+                try:
+                    fut = executors[name].submit(run_job, job)
+                except BrokenProcessPool:
+                    # Pool cassé : on le remplace, le job déjà réservé part dans le nouveau
+                    print(f"♻️ Voie {name} : pool de processus recréé")
+                    executors[name].shutdown(wait=False)
+                    executors[name] = _new_executor(lane)
+                    fut = executors[name].submit(run_job, job)
+                # Un slot qui se libère réveille aussi le dispatcher
+                fut.add_done_callback(_on_slot_done)
+                running[name][fut] = job
+        
+        # 3. Attend un nouveau job, la fin d'un slot ou le polling de secours
+        wakeup.wait(store.next_wakeup_delay())
 
 if __name__ == "__main__":
-    main()
+    if pool_mode():
+        main_pool()
+    else:
+        main()
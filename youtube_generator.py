@@ -1,102 +1,358 @@
 import subprocess
 import os
-import re
+import math
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from render_assets import prepare_static_composite, prepare_motion_plate, motion_frames, still_loop
+from render_cache import RenderCache
+from media_index import indexed_duration
+from ffmpeg_runner import run_ffmpeg
+from render_governor import cpu_budget
+
+# --- RENDU PAR SEGMENTS ---
+# Les épisodes longs sont découpés en segments encodés en parallèle puis recollés
+# (concat demuxer, sans ré-encodage). Les coupes tombent sur des keyframes.
+FPS = 25
+SEGMENT_GOP = 250  # images par GOP (10 s à 25 fps)
+MIN_SEGMENT_SECONDS = 120
+# "1" = un seul ffmpeg (défaut), "auto" = un segment par cœur, ou un nombre
+RENDER_SEGMENTS = os.environ.get("OPPODCAST_RENDER_SEGMENTS", "1")
+
+# Mode quality : zoom lent du fond, de 1 à ZOOM_MAX (40 s à 25 fps) puis fixe
+ZOOM_STEP = 0.0002
+ZOOM_MAX = 1.2
+
+# Mode static (archives longues) : composite fixe encodé à très basse fréquence d'images,
+# waveform rafraîchie au même rythme, une keyframe par minute
+STATIC_FPS = int(os.environ.get("OPPODCAST_STATIC_FPS", "2"))
+STATIC_GOP_SECONDS = 60
+
+
+# Aperçus : image fixe ou extrait court, même graphe que le rendu final, sortie réduite
+PREVIEW_SCALE = 0.5
+PREVIEW_SECONDS = 5
+
+
+def render_fps(render_mode):
+    """Fréquence d'images du rendu : basse en mode static, FPS sinon"""
+    return STATIC_FPS if render_mode == "static" else FPS
 
 class YouTubeGenerator:
     def __init__(self, output_dir="generated"):
         self.output_dir = output_dir
+        # Statistiques ffmpeg du dernier encodage (out_time, wall...) ; None si servi par le cache
+        self.last_render = None
         os.makedirs(self.output_dir, exist_ok=True)
 
     def get_audio_duration(self, audio_path):
+        # Durée déjà connue de l'index de l'inbox : pas de processus ffprobe
+        duration = indexed_duration(audio_path)
+        if duration:
+            return duration
         cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", audio_path]
         try: return float(subprocess.check_output(cmd).decode().strip())
         except: return 0.0
 
-    def generate_video(self, audio_path, image_path, output_filename="video.mp4", format="square", progress_callback=None, render_mode="balanced", bg_color="#000000"):
+    def plan_segments(self, total_duration, segments):
+        """
+        Découpe [0, total_duration] en au plus `segments` tranches de (start, durée).
+        Les bornes sont des multiples du GOP pour que chaque segment commence sur une keyframe
+        et que la concaténation sans ré-encodage soit exacte.
+        """
+        if segments == "auto":
+            segments = os.cpu_count() or 1
+        segments = max(1, min(int(segments), int(total_duration // MIN_SEGMENT_SECONDS) or 1))
+        if segments == 1:
+            return [(0.0, total_duration)]
+
+        gop_seconds = SEGMENT_GOP / FPS
+        length = math.ceil(total_duration / segments / gop_seconds) * gop_seconds
+        plan, start = [], 0.0
+        while start < total_duration:
+            plan.append((start, min(length, total_duration - start)))
+            start += length
+        return plan
+
+    def cache_key(self, cache, audio_path, image_path, format, render_mode, bg_color, wave_engine="showwaves"):
+        params = dict(kind="video", format=format, render_mode=render_mode, bg_color=bg_color)
+        if wave_engine != "showwaves":
+            params["wave_engine"] = wave_engine
+        return cache.key_for([audio_path, image_path], **params)
+
+    def generate_video(self, audio_path, image_path, output_filename="video.mp4", format="square", progress_callback=None, render_mode="balanced", bg_color="#000000", stats_callback=None, use_cache=True, segments=None, wave_engine="showwaves"):
         """
         render_mode: 
           - 'turbo': Fond couleur unie (Rapide)
           - 'balanced': Flou léger optimisé (Standard)
           - 'quality': Flou artistique + Zoom lent (Lent)
+          - 'static': Fond flouté, basse fréquence d'images (archives longues : vitesse et poids)
+        use_cache: un rendu identique (mêmes fichiers, mêmes paramètres) est réutilisé sans ré-encodage
+        segments: nombre de segments encodés en parallèle ("auto" = un par cœur, défaut : OPPODCAST_RENDER_SEGMENTS)
+        wave_engine: 'showwaves' (ffmpeg) ou 'numpy' (dessinée depuis l'enveloppe audio en cache)
         """
         output_path = os.path.join(self.output_dir, output_filename)
+        self.last_render = None
+        segments = RENDER_SEGMENTS if segments is None else segments
+        render = lambda: self._render_video(audio_path, image_path, output_path, format, progress_callback, render_mode, bg_color, stats_callback, segments, wave_engine)
+        if not use_cache:
+            return render()
+
+        cache = RenderCache(os.path.join(self.output_dir, ".cache", "renders"))
+        key = self.cache_key(cache, audio_path, image_path, format, render_mode, bg_color, wave_engine)
+        output_path, hit = cache.get_or_render(key, output_path, render)
+        if hit and progress_callback: progress_callback(100)
+        return output_path
+
+    def generate_preview(self, audio_path, image_path, format="square", render_mode="balanced", bg_color="#000000",
+                         at=None, seconds=0, wave_engine="showwaves"):
+        """
+        Aperçu rapide du rendu, à partir de `at` secondes (défaut : 1 min, ou le milieu d'un épisode court).
+        seconds=0 : une image JPEG ; sinon un extrait MP4 de `seconds` secondes (ultrafast).
+        Même filter_complex que generate_video (zoom du mode quality repris à `at`),
+        seule la sortie est réduite (PREVIEW_SCALE). Jamais mis en cache : le fichier est écrasé.
+        """
         total_duration = self.get_audio_duration(audio_path)
-        print(f"[YouTube {render_mode.upper()}] Génération PC : {output_filename}")
+        if at is None:
+            at = min(60.0, total_duration / 2)
+        at = max(0.0, min(float(at), max(total_duration - max(seconds, 1), 0.0)))
+        fps = render_fps(render_mode)
 
-        if format == "square":
-            W, H = 1080, 1080
-            fg_size = 750
-            wave_h = 280
-            wave_y = "H-320"
+        waveform = None
+        if wave_engine == "numpy":
+            from waveform_engine import NumpyWaveform
+            W, _, _, wave_h, _ = self._layout(format)
+            waveform = NumpyWaveform.for_audio(audio_path, W, wave_h, cache_root=os.path.join(self.output_dir, ".cache"), fps=fps)
+        video_input, filter_complex = self._build_graph(
+            image_path, format, render_mode, bg_color, total_duration, wave_in="[2:v]" if waveform else None
+        )
+        filter_complex = filter_complex.replace("{offset}", f"{at:.3f}") + f";[outv]scale=trunc(iw*{PREVIEW_SCALE}/2)*2:-2[preview]"
+
+        preview_dir = os.path.join(self.output_dir, ".previews")
+        os.makedirs(preview_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(audio_path))[0]
+        if seconds:
+            output_path = os.path.join(preview_dir, f"{stem}_{format}_{render_mode}.mp4")
+            output_args = [
+                "-map", "[preview]", "-map", "1:a",
+                "-c:v", "libx264", "-preset", "ultrafast", "-crf", "30", "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-b:a", "96k", "-t", str(seconds), output_path
+            ]
         else:
-            W, H = 1920, 1080 
-            fg_size = 700
-            wave_h = 250
-            wave_y = "H-250"
+            output_path = os.path.join(preview_dir, f"{stem}_{format}_{render_mode}.jpg")
+            output_args = ["-map", "[preview]", "-frames:v", "1", "-q:v", "3", output_path]
 
-        bg_filter = ""
-        fg_input = "[0:v]" 
-        
-        if render_mode == "turbo":
+        # Extrait brut du MP3 (pas d'AAC en cache à préparer pour un aperçu)
+        cmd = [
+            "ffmpeg", "-y", "-framerate", str(fps), "-i", video_input,
+            "-ss", f"{at:.3f}", "-t", str(max(seconds, 1)), "-i", audio_path,
+            *(waveform.input_args() if waveform else []),
+            "-filter_complex", filter_complex,
+            *output_args
+        ]
+        writer = None
+        if waveform:
+            writer = lambda stream: waveform.write_frames(stream, round(at * fps), math.ceil(max(seconds, 1) * fps))
+        run_ffmpeg(cmd, stdin_writer=writer, label=f"preview:{format}:{render_mode}")
+        return output_path
 
-            bg_filter = (
-                f"color=c={bg_color}:s={W}x{H}:d={total_duration}[bg];"
-            )
+    def _layout(self, format):
+        """(W, H, taille pochette, hauteur waveform, position waveform)"""
+        if format == "square":
+            return 1080, 1080, 750, 280, "H-320"
+        return 1920, 1080, 700, 250, "H-250"
 
-            fg_input = "[0:v]"
-        
-        elif render_mode == "balanced":
+    def _build_graph(self, image_path, format, render_mode, bg_color, total_duration, video_in=None, audio_in="[1:a]", tag="", wave_in=None):
+        """
+        Entrée image + filter_complex produisant [outv{tag}] à partir de video_in (image) et audio_in (audio).
+        Sans video_in, l'image est l'entrée 0, décodée une fois et répétée dans le graphe.
+        tag suffixe les étiquettes internes pour combiner plusieurs graphes (rendu groupé).
+        wave_in : flux vidéo RGBA de waveform déjà dessinée (moteur numpy) à la place de showwaves.
+        """
+        W, H, fg_size, wave_h, wave_y = self._layout(format)
+        still = ""
+        if video_in is None:
+            still, video_in = f"[0:v]{still_loop(render_fps(render_mode))}[still{tag}];", f"[still{tag}]"
 
-            bg_filter = (
-                f"[0:v]scale={W}:{H}:force_original_aspect_ratio=increase,crop={W}:{H},"
-                f"gblur=sigma=20:steps=2,eq=brightness=-0.3[bg];"
+        if wave_in:
+            wave_filter = f"{wave_in}format=rgba[wave{tag}];"
+        else:
+            wave_filter = f"{audio_in}showwaves=s={W}x{wave_h}:mode=cline:colors=white@0.8:rate={render_fps(render_mode)}[wave{tag}];"
+        video_input = image_path
+
+        if render_mode in ("turbo", "balanced", "static"):
+            # Fond + pochette statiques : précalculés une fois (Pillow, mis en cache),
+            # seule la waveform est composée à chaque image (static : même fond qu'en balanced)
+            video_input = prepare_static_composite(
+                image_path, W, H, (None, fg_size), render_mode="balanced" if render_mode == "static" else render_mode, bg_color=bg_color,
+                blur_sigma=20, brightness=-0.3, cache_dir=os.path.join(self.output_dir, ".cache", "composites")
+            )
+            filter_complex = (
+                still + wave_filter +
+                f"{video_in}[wave{tag}]overlay=x=0:y={wave_y}:format=auto[outv{tag}]"
             )
-            fg_input = "[0:v]"
 
         else:
+            # Fond flouté une fois à la taille du zoom maximal (planche en cache) :
+            # par image, seulement un recadrage/réduction, et plus rien une fois le zoom plafonné.
+            # Zoom exprimé en fonction du numéro d'image (et non de l'image précédente) :
+            # un segment qui démarre à t reprend exactement le zoom de l'encodage complet
+            video_input, (BW, BH), (fw, fh) = prepare_motion_plate(
+                image_path, W, H, (None, fg_size), zoom_max=ZOOM_MAX, blur_sigma=30, brightness=-0.4,
+                cache_dir=os.path.join(self.output_dir, ".cache", "composites")
+            )
             bg_filter = (
-                f"[0:v]scale=8000:-1,zoompan=z='min(zoom+0.0002,1.2)':d={total_duration*25}:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={W}x{H},"
-                f"gblur=sigma=30:steps=3,eq=brightness=-0.4[bg];"
+                f"{video_in}split=2[src{tag}][fgsrc{tag}];"
+                f"[src{tag}]crop={BW}:{BH}:0:0,"
+                f"zoompan=z='min(1+{ZOOM_STEP}*(on+1+{FPS}*{{offset}}),{ZOOM_MAX})':d=1:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={W}x{H}:fps={FPS},"
+                f"trim=end_frame={motion_frames(ZOOM_STEP, ZOOM_MAX)},tpad=stop=-1:stop_mode=clone[bg{tag}];"
+            )
+
+            filter_complex = (
+                still + bg_filter +
+                f"[fgsrc{tag}]crop={fw}:{fh}:0:{BH}[fg{tag}];"
+                + wave_filter +
+                f"[bg{tag}][fg{tag}]overlay=(W-w)/2:(H-h)/2[comp{tag}];"
+                f"[comp{tag}][wave{tag}]overlay=x=0:y={wave_y}:format=auto[outv{tag}]"
+            )
+        return video_input, filter_complex
+
+    def _render_video(self, audio_path, image_path, output_path, format, progress_callback, render_mode, bg_color, stats_callback, segments=1, wave_engine="showwaves"):
+        output_filename = os.path.basename(output_path)
+        total_duration = self.get_audio_duration(audio_path)
+        # Le mode static est déjà bien plus rapide que le temps réel : pas de segments
+        if render_mode == "static":
+            segments = 1
+        plan = self.plan_segments(total_duration, segments) if total_duration > 0 else [(0.0, 0.0)]
+        print(f"[YouTube {render_mode.upper()}] Génération PC : {output_filename}"
+              + (f" ({len(plan)} segments en parallèle)" if len(plan) > 1 else ""))
+
+        waveform = None
+        if wave_engine == "numpy":
+            from waveform_engine import NumpyWaveform
+            W, _, _, wave_h, _ = self._layout(format)
+            waveform = NumpyWaveform.for_audio(
+                audio_path, W, wave_h, cache_root=os.path.join(self.output_dir, ".cache"), fps=render_fps(render_mode)
             )
-            fg_input = "[0:v]"
-
-        filter_complex = (
-            bg_filter +
-            f"{fg_input}scale=-1:{fg_size}:force_original_aspect_ratio=decrease[fg];"
-            f"[1:a]showwaves=s={W}x{wave_h}:mode=cline:colors=white@0.8:rate=25[wave];"
-            f"[bg][fg]overlay=(W-w)/2:(H-h)/2[comp1];"
-            f"[comp1][wave]overlay=x=0:y={wave_y}:format=auto[outv]"
+        video_input, filter_complex = self._build_graph(
+            image_path, format, render_mode, bg_color, total_duration, wave_in="[2:v]" if waveform else None
         )
+        # AAC encodé une fois par épisode : recopié tel quel dans la vidéo
+        from audio_analysis import ensure_aac
+        audio_track = ensure_aac(audio_path, cache_dir=os.path.join(self.output_dir, ".cache", "aac"))
 
-        cmd = [
-            "ffmpeg", "-y", "-loop", "1", "-i", image_path, "-i", audio_path,
-            "-filter_complex", filter_complex,
-            "-map", "[outv]", "-map", "1:a",
-            
-            "-c:v", "libx264", 
-            "-preset", "medium", 
-            "-crf", "23", 
-            "-tune", "stillimage", 
-            "-c:a", "aac", "-b:a", "192k",
-            "-shortest", "-pix_fmt", "yuv420p",
-            output_path
-        ]
+        def report(stats):
+            if total_duration <= 0:
+                return
+            if progress_callback: progress_callback(stats["percent"])
+            if stats_callback: stats_callback(stats)
+
+        label = f"video:{format}:{render_mode}:{output_filename}"
+        if len(plan) > 1:
+            self.last_render = self._render_segments(plan, video_input, audio_track, filter_complex, output_path, report, waveform, total_duration, label)
+        else:
+            fps = render_fps(render_mode)
+            static_args = []
+            if render_mode == "static":
+                # Image fixe à basse fréquence, GOP long : la plupart des images ne coûtent presque rien
+                gop = fps * STATIC_GOP_SECONDS
+                static_args = ["-r", str(fps), "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0", "-movflags", "+faststart"]
+            cmd = [
+                "ffmpeg", "-y", "-framerate", str(fps), "-i", video_input, "-i", audio_track,
+                *(waveform.input_args() if waveform else []),
+                "-filter_complex", filter_complex.replace("{offset}", "0"),
+                "-map", "[outv]", "-map", "1:a",
+                
+                "-c:v", "libx264", 
+                "-preset", "medium", 
+                "-crf", "23", 
+                "-tune", "stillimage", 
+                *static_args,
+                "-c:a", "copy",
+                "-shortest", "-pix_fmt", "yuv420p",
+                output_path
+            ]
+            writer = (lambda stream: waveform.write_frames(stream, 0, math.ceil(total_duration * fps))) if waveform else None
+            self.last_render = run_ffmpeg(cmd, duration=total_duration, on_progress=report, stdin_writer=writer, label=label)
 
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-        pattern = re.compile(r"time=(\d{2}):(\d{2}):(\d{2}\.\d{2})")
-        
-        while True:
-            line = process.stderr.readline()
-            if not line and process.poll() is not None: break
-            if line:
-                print(line.strip())
-                if total_duration > 0 and progress_callback:
-                    match = pattern.search(line)
-                    if match:
-                        h, m, s = map(float, match.groups())
-                        curr = h*3600 + m*60 + s
-                        progress_callback(min(int((curr/total_duration)*100), 99))
-        
-        if process.returncode != 0: raise RuntimeError("FFmpeg Error")
         if progress_callback: progress_callback(100)
         return output_path
+
+    def _render_segments(self, plan, video_input, audio_path, filter_complex, output_path, report, waveform, total_duration, label):
+        """
+        Encode chaque segment (vidéo seule) dans son propre ffmpeg, en parallèle, puis
+        recolle les segments sans ré-encodage et ajoute la piste AAC en cache d'un seul tenant
+        (évite les micro-coupures AAC aux jointures).
+        Renvoie les statistiques de l'ensemble : média encodé et temps écoulé, concat comprise.
+        """
+        started = time.time()
+        threads = max(1, cpu_budget() // len(plan))
+        work_dir = tempfile.mkdtemp(prefix=".segments-", dir=self.output_dir)
+        latest = [{} for _ in plan]
+        lock = threading.Lock()
+
+        def on_segment_progress(index):
+            # Agrégat de tous les segments : temps encodé cumulé, débits additionnés
+            def on_progress(stats):
+                with lock:
+                    latest[index] = dict(stats, out_time=min(stats["out_time"], plan[index][1]))
+                    total = {"out_time": sum(s.get("out_time", 0.0) for s in latest)}
+                    for key in ("fps", "speed", "frames", "dropped"):
+                        values = [s[key] for s in latest if s.get(key) is not None]
+                        total[key] = sum(values) if values else None
+                    total["percent"] = min(int(total["out_time"] / total_duration * 100), 99)
+                    if total["speed"]:
+                        total["eta"] = (total_duration - total["out_time"]) / total["speed"]
+                    report(total)
+            return on_progress
+
+        def encode(index):
+            start, length = plan[index]
+            segment_path = os.path.join(work_dir, f"segment_{index:03d}.mp4")
+            cmd = [
+                "ffmpeg", "-y", "-hide_banner",
+                "-framerate", str(FPS), "-i", video_input,
+                "-ss", f"{start:.3f}", "-t", f"{length:.3f}", "-i", audio_path,
+                *(waveform.input_args() if waveform else []),
+                "-filter_complex", filter_complex.replace("{offset}", f"{start:.3f}"),
+                "-map", "[outv]", "-an", "-t", f"{length:.3f}", "-r", str(FPS),
+                "-c:v", "libx264",
+                "-preset", "medium",
+                "-crf", "23",
+                "-tune", "stillimage",
+                "-g", str(SEGMENT_GOP), "-keyint_min", str(SEGMENT_GOP), "-sc_threshold", "0",
+                "-threads", str(threads),
+                "-pix_fmt", "yuv420p",
+                segment_path
+            ]
+            writer = None
+            if waveform:
+                writer = lambda stream: waveform.write_frames(stream, round(start * FPS), math.ceil(length * FPS))
+            run_ffmpeg(cmd, duration=length, on_progress=on_segment_progress(index), stdin_writer=writer, label=f"{label}:segment{index}")
+            return segment_path
+
+        try:
+            # Les threads ne font qu'attendre : chaque segment est un processus ffmpeg distinct
+            with ThreadPoolExecutor(max_workers=len(plan)) as pool:
+                segment_paths = list(pool.map(encode, range(len(plan))))
+
+            list_path = os.path.join(work_dir, "segments.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                for path in segment_paths:
+                    f.write(f"file '{os.path.abspath(path)}'\n")
+
+            run_ffmpeg([
+                "ffmpeg", "-y", "-hide_banner",
+                "-f", "concat", "-safe", "0", "-i", list_path, "-i", audio_path,
+                "-map", "0:v", "-map", "1:a",
+                "-c:v", "copy",
+                "-c:a", "copy",
+                "-shortest",
+                output_path
+            ], label=f"{label}:concat")
+            return {"out_time": sum(s.get("out_time", 0.0) for s in latest), "wall": time.time() - started}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
@@ -1,9 +1,12 @@
 import os
 import pickle
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+import importlib.util
+
+# Heavy Google client libraries are only imported on first authentication/upload
+GOOGLE_CLIENT_AVAILABLE = (
+    importlib.util.find_spec("googleapiclient") is not None
+    and importlib.util.find_spec("google_auth_oauthlib") is not None
+)
 
 class YouTubeUploader:
     def __init__(self, client_secret_file="client_secret.json"):
@@ -15,6 +18,10 @@ class YouTubeUploader:
 
     def authenticate(self):
         """Handles OAuth2 flow."""
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from google.auth.transport.requests import Request
+        from googleapiclient.discovery import build
+
         if os.path.exists('token.pickle'):
             with open('token.pickle', 'rb') as token:
                 self.credentials = pickle.load(token)
@@ -36,6 +43,8 @@ class YouTubeUploader:
         return build(self.api_service_name, self.api_version, credentials=self.credentials)
 
     def upload_video(self, file_path, title, description, category_id="22", privacy="private"):
+        from googleapiclient.http import MediaFileUpload
+
         youtube = self.authenticate()
 
         body = {